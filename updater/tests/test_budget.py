@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from updater.updater.budget import Budget, Estimate, checkpoint_path, estimate_tokens
+
+
+def test_estimate_cost_and_time():
+    """
+    test ensures that the projection adds up tokens per request and
+    prices them per 1M tokens
+    """
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcde") == 2
+    estimate = Estimate()
+    estimate.add_request("x" * 4000, rows=20, output_tokens=3000)
+    estimate.add_request("x" * 2000, rows=10, output_tokens=1500)
+    assert (estimate.requests, estimate.rows) == (2, 30)
+    assert (estimate.input_tokens, estimate.output_tokens) == (1500, 4500)
+    assert abs(estimate.cost(1.0, 2.0) - (1500 + 9000) / 1e6) < 1e-12
+    assert estimate.seconds() > 0
+
+
+def test_budget_stops_before_exceeding_tokens():
+    """
+    test ensures that the next batch is refused as soon as the average
+    batch would no longer fit into the token budget
+    """
+    used = [0.0]
+    budget = Budget(max_tokens=1000, used_tokens=lambda: used[0])
+    sent = 0
+    while budget.allows_next():
+        used[0] += 300
+        budget.charge()
+        sent += 1
+    # 3 * 300 = 900, a fourth batch would need 1200
+    assert sent == 3
+    assert "Token-Budget" in budget.stopped
+    assert not budget.allows_next()
+
+
+def test_budget_checks_first_batch():
+    """
+    test ensures that the first batch is checked against its estimate,
+    a zero budget sends nothing
+    """
+    assert not Budget(max_tokens=0).allows_next()
+    first = Estimate()
+    first.add_request("x" * 4000, rows=20, output_tokens=3000)
+    assert not Budget(max_tokens=2000).allows_next(first)
+    assert Budget(max_tokens=5000).allows_next(first)
+    assert not Budget(deadline_seconds=1.0).allows_next(first)
+
+
+def test_budget_deadline():
+    """
+    test ensures that an expired deadline stops the run and no limit never does
+    """
+    assert Budget().allows_next()
+    budget = Budget(deadline_seconds=0.0)
+    assert not budget.allows_next()
+    assert budget.stopped == "Deadline erreicht"
+
+
+def test_checkpoint_path():
+    """
+    test ensures that the open rows are stored next to the output file
+    """
+    assert checkpoint_path(Path("out/gemini_output.json")) == Path("out/gemini_output.pending.json")
+    assert checkpoint_path(Path("result")) == Path("result.pending.json")
@@ -0,0 +1,55 @@
+from updater.updater.gender_rules import resolve_gender, resolve_german, resolve_russian
+
+
+def test_german_lexicon_and_suffixes():
+    """
+    test ensures that compounds use their head noun and suffix rules apply
+    Returns:
+        None: Asserts the genus of known names
+    """
+    assert resolve_german("Braunkopf-Klammeraffe")[0] == "M"
+    assert resolve_german("Blaumaulmeerkatze")[0] == "F"
+    assert resolve_german("Grevyzebra")[0] == "N"
+    assert resolve_german("Erdmännchen")[0] == "N"
+    assert resolve_german("Tarpan-Rückzüchtung")[0] == "F"
+    # -ion only as latin -tion/-sion
+    assert resolve_german("Population")[0] == "F"
+    assert resolve_german("Kaiserskorpion") is None
+    # unknown head nouns go to the LLM
+    assert resolve_german("Vielfraß") is None
+    assert resolve_german("Kreuzotter") is None
+
+
+def test_russian_endings_and_exceptions():
+    """
+    test ensures the -а/-я, consonant and exception rules on the head noun
+    Returns:
+        None: Asserts the genus of known names
+    """
+    assert resolve_russian("Голуболицая мартышка")[0] == "F"
+    assert resolve_russian("Чёрно-белая кобра")[0] == "F"
+    assert resolve_russian("Обыкновенный гоголь")[0] == "M"
+    assert resolve_russian("Белощёкая шилохвость")[0] == "F"
+    assert resolve_russian("Чирок-клоктун")[0] == "M"
+    assert resolve_russian("Обыкновенный шимпанзе")[0] == "M"
+    assert resolve_russian("Агути Азары")[0] == "M"
+    assert resolve_russian("Сине-жёлтый ара")[0] == "M"
+    # ambiguous: unknown -ь, plurals, two nouns, alternatives
+    assert resolve_russian("Степной хорь") is None
+    assert resolve_russian("Африканские гадюки") is None
+    assert resolve_russian("Вара попугай") is None
+    assert resolve_russian("Песец/полярная лисица") is None
+
+
+def test_resolve_gender_reason():
+    """
+    test ensures that the local reason names both resolved fields
+    Returns:
+        None: Asserts result fields
+    """
+    result = resolve_gender({"german": "Schimpanse", "russian": "Обыкновенный шимпанзе"})
+    assert result.complete
+    assert (result.german, result.russian) == ("M", "M")
+    assert result.reason.startswith("Genusregel (lokal): Deutsch M")
+    partial = resolve_gender({"german": "Vielfraß", "russian": "Росомаха"})
+    assert not partial.complete and partial.russian == "F"
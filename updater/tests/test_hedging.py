@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from updater.updater.llm_support.hedging import HedgingPolicy
+
+
+def test_no_hedge_without_history():
+    """
+    test ensures that no duplicate is sent before enough latencies are known
+    Returns:
+        None: Asserts that the call ran once and nothing was hedged
+    """
+    policy = HedgingPolicy(percentile=90, max_hedge_rate=1.0, min_samples=5)
+    calls = []
+    assert policy.run(lambda: calls.append(1) or "ok") == "ok"
+    assert len(calls) == 1
+    assert policy.stats()["hedged"] == 0
+
+
+def test_slow_request_is_hedged_and_first_answer_wins():
+    """
+    test ensures that a request slower than the percentile gets a duplicate
+    and the faster duplicate answer is returned
+    Returns:
+        None: Asserts that the hedge won
+    """
+    policy = HedgingPolicy(percentile=50, max_hedge_rate=1.0, min_samples=3)
+    for _ in range(3):
+        policy.record(0.01)
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            counter["n"] += 1
+            n = counter["n"]
+        # first call hangs, the duplicate answers at once
+        if n == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    assert policy.run(call) == "fast"
+    stats = policy.stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_hedge_rate_is_capped():
+    """
+    test ensures that max_hedge_rate bounds the number of duplicates
+    Returns:
+        None: Asserts that with rate 0 nothing is hedged
+    """
+    policy = HedgingPolicy(percentile=50, max_hedge_rate=0.0, min_samples=1)
+    policy.record(0.001)
+    assert policy.run(lambda: time.sleep(0.02) or "ok") == "ok"
+    assert policy.stats()["hedged"] == 0
+
+
+def test_invalid_percentile():
+    """
+    test ensures that an invalid percentile is rejected
+    """
+    with pytest.raises(ValueError):
+        HedgingPolicy(percentile=100)
+
+
+def test_failed_primary_lets_hedge_win():
+    """
+    test ensures that a not accepted primary answer (e.g. HTTP 429)
+    does not win against the duplicate
+    Returns:
+        None: Asserts that the accepted hedge answer is returned
+    """
+    policy = HedgingPolicy(percentile=50, max_hedge_rate=1.0, min_samples=3)
+    for _ in range(3):
+        policy.record(0.01)
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            counter["n"] += 1
+            n = counter["n"]
+        if n == 1:
+            # slow enough for the hedge, then fails
+            time.sleep(0.1)
+            return 429
+        time.sleep(0.3)
+        return 200
+
+    assert policy.run(call, accept=lambda status: status == 200) == 200
+    assert policy.stats()["hedge_wins"] == 1
+    # both not accepted: the primary answer is returned
+    assert policy.run(lambda: time.sleep(0.05) or 500, accept=lambda status: status == 200) == 500
+
+
+def test_hedge_cap_holds_across_threads():
+    """
+    test ensures that concurrent callers cannot exceed max_hedge_rate together
+    Returns:
+        None: Asserts the hedge count after parallel slow calls
+    """
+    policy = HedgingPolicy(percentile=50, max_hedge_rate=0.25, min_samples=1)
+    policy.record(0.001)
+    threads = [threading.Thread(target=policy.run, args=(lambda: time.sleep(0.05) or "ok",))
+               for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = policy.stats()
+    assert stats["requests"] == 16
+    assert stats["hedged"] <= 0.25 * 16
+
+
+def test_losing_request_runs_in_daemon_thread():
+    """
+    test ensures that the dropped request does not keep the interpreter alive
+    """
+    policy = HedgingPolicy(percentile=50, max_hedge_rate=1.0, min_samples=1)
+    policy.record(0.001)
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    assert policy.run(call) == "fast"
+    losers = [t for t in threading.enumerate() if t.name == "llm-hedge" and t.is_alive()]
+    assert losers and all(t.daemon for t in losers)
+    release.set()
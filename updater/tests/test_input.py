@@ -0,0 +1,110 @@
+import io
+import json
+
+import pytest
+
+from updater.updater.input import ExtractorResultError, _decode_items, iter_extractor_items, load_extractor_result
+
+RECORDS = [
+    {"category": "Affen", "latin": "Pan troglodytes", "german": "Schimpanse",
+     "russian": "Обыкновенный шимпанзе"},
+    {"category": "Affen", "latin": "Gorilla \"gorilla\"", "german": "Gorilla, West [1]",
+     "russian": "Западная горилла \\ {x}"},
+    [1, 2, {"nested": []}],
+    "text",
+    0.5,
+    None,
+]
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_iter_items_matches_json_load(tmp_path, use_mmap):
+    """
+    test ensures that the streamed items equal json.load with and without memory map,
+    also if strings with brackets, commas and escapes cross chunk borders
+    Returns:
+        None: Asserts identical items
+    """
+    path = tmp_path / "result.json"
+    path.write_text(json.dumps(RECORDS, ensure_ascii=False, indent=2), encoding="utf-8")
+    for chunk_size in (1, 5, 1 << 16):
+        items = iter_extractor_items(path, use_mmap=use_mmap, chunk_size=chunk_size)
+        assert list(items) == RECORDS
+
+
+def test_iter_items_is_lazy(tmp_path):
+    """
+    test ensures that items are returned before the rest of the file is read
+    """
+    path = tmp_path / "result.json"
+    path.write_text('[{"latin": "Pan troglodytes"}, {"latin": "Gorilla"}, kaputt', encoding="utf-8")
+    items = iter_extractor_items(path, use_mmap=False, chunk_size=8)
+    assert next(items) == {"latin": "Pan troglodytes"}
+    assert next(items) == {"latin": "Gorilla"}
+    with pytest.raises(ExtractorResultError):
+        next(items)
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_malformed_item_raises_without_reading_file(tmp_path, use_mmap):
+    """
+    test ensures that a malformed item near the start of a large array
+    raises at once with its position in the file, only a truncated item
+    makes the reader load the next chunk
+    """
+    tail = ", ".join(json.dumps(RECORDS[0], ensure_ascii=False) for _ in range(20000)) + "]"
+    data = ('[{"latin": "Pan"}, {"latin": kaputt}, ' + tail).encode("utf-8")
+    f = io.BytesIO(data)
+    items = _decode_items(f, chunk_size=64)
+    assert next(items) == {"latin": "Pan"}
+    with pytest.raises(ExtractorResultError, match="item 1 at character 29"):
+        next(items)
+    assert f.tell() <= 128
+    path = tmp_path / "result.json"
+    path.write_bytes(data)
+    with pytest.raises(ExtractorResultError, match="at character 29"):
+        list(iter_extractor_items(path, use_mmap=use_mmap, chunk_size=64))
+    # text right after a complete item
+    f = io.BytesIO(('[{"a": 1}x, ' + tail).encode("utf-8"))
+    with pytest.raises(ExtractorResultError, match="after JSON item 0 at character 9"):
+        list(_decode_items(f, chunk_size=64))
+    assert f.tell() <= 128
+    # literals and numbers cut by the chunk border are read on
+    path.write_text("[true, -12.5e3, 1e5, null, " + tail, encoding="utf-8")
+    items = list(iter_extractor_items(path, use_mmap=use_mmap, chunk_size=3))
+    assert items[:4] == [True, -12500.0, 100000.0, None] and len(items) == 20004
+
+
+@pytest.mark.parametrize("text", ["", "[1,,2]", "[1, 2", "x", '["offen'])
+def test_iter_items_raises(tmp_path, text):
+    """
+    test ensures that invalid files raise instead of exiting
+    """
+    path = tmp_path / "result.json"
+    path.write_text(text, encoding="utf-8")
+    for use_mmap in (True, False):
+        with pytest.raises(ExtractorResultError):
+            list(iter_extractor_items(path, use_mmap=use_mmap, chunk_size=2))
+
+
+def test_load_extractor_result_raises(tmp_path):
+    """
+    test ensures that load_extractor_result raises for missing, unreadable and invalid files,
+    top level objects are one item of the streaming reader
+    """
+    with pytest.raises(ExtractorResultError):
+        load_extractor_result(tmp_path / "fehlt.json")
+    with pytest.raises(ExtractorResultError):
+        list(iter_extractor_items(tmp_path / "fehlt.json"))
+    # a directory is no file, also other OSErrors are ExtractorResultErrors
+    with pytest.raises(ExtractorResultError):
+        load_extractor_result(tmp_path)
+    with pytest.raises(ExtractorResultError):
+        list(iter_extractor_items(tmp_path))
+    path = tmp_path / "result.json"
+    path.write_text("{kein json", encoding="utf-8")
+    with pytest.raises(ExtractorResultError):
+        load_extractor_result(path)
+    path.write_text('{"items": [1]}', encoding="utf-8")
+    assert load_extractor_result(path) == {"items": [1]}
+    assert list(iter_extractor_items(path)) == [{"items": [1]}]
@@ -1,2 +1,335 @@
+import argparse
+import json
+import os
+
+import pytest
+
+try:
+    from updater.updater import __main__ as main
+except (ImportError, SystemExit):
+    # the LLM client needs requests, jinja2, pydantic and a key in .env
+    pytest.skip("LLM client not available", allow_module_level=True)
+
+
+def answer(record, score=0.9):
+    return {**record, "gender_russian": "M", "gender_german": "M", "score": score,
+            "reason": "Quelle [1]", "gender_reason": "Genusregel"}
+
+
+def watch_args(tmp_path, **overrides):
+    values = dict(csv=tmp_path / "a.csv", csv2=tmp_path / "b.csv", output=tmp_path / "out.json",
+                  batch_size=10, max_retries=0, no_local_gender=False, lean=False, top_k=None,
+                  metrics_file=None, watch_interval=0.0)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_watch_sees_edit_during_first_update(tmp_path, monkeypatch):
+    """
+    test ensures that a file edited while the first update runs is
+    processed in the next poll
+    """
+    args = watch_args(tmp_path)
+    args.csv.write_text("Affen:\nPan troglodytes,Schimpanse,Шимпанзе\n", encoding="utf-8")
+    args.csv2.write_text("Affen:\nGorilla gorilla,Gorilla,Горилла\n", encoding="utf-8")
+    calls = []
+
+    def process_rows(store, ids, *rest):
+        calls.append([row.latin for row in store.rows])
+        if len(calls) == 1:
+            # edit during the first run
+            args.csv.write_text("Affen:\nPan paniscus,Bonobo,Бонобо\n", encoding="utf-8")
+            stat = args.csv.stat()
+            os.utime(args.csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        return store.add_run(ids, [answer(record) for record in store.batch(ids)])
+
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 1:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "process_rows", process_rows)
+    monkeypatch.setattr(main.time, "sleep", sleep)
+    main.watch(args)
+
+    assert calls == [["Pan troglodytes", "Gorilla gorilla"], ["Pan paniscus"]]
+    written = json.loads(args.output.read_text(encoding="utf-8"))
+    assert sorted(r["latin"] for r in written) == ["Gorilla gorilla", "Pan paniscus"]
+
+
+
+def stub_llm(monkeypatch, answer_fn):
+    """
+    replace the LLM call, answer_fn gets task and payload and returns the parsed answer
+    """
+    sent = []
+
+    def query_parsed(task, **prompt_args):
+        sent.append((task, prompt_args["payload"]))
+        return answer_fn(task, prompt_args["payload"])
+
+    monkeypatch.setattr(main.gemini, "query_parsed", query_parsed)
+    return sent
+
+
+def test_local_gender_is_merged_by_id(monkeypatch):
+    """
+    test ensures that the local genus reaches its record through the
+    batch-local id, also if the LLM changed a name and the order
+    """
+    batch = [
+        {"category": "Affen", "latin": "Pan troglodytes", "german": "Schimpanse",
+         "russian": "Обыкновенный шимпанзе"},
+        {"category": "Affen", "latin": "Cercopithecus cephus", "german": "Blaumaulmeerkatze",
+         "russian": "Голуболицая мартышка"},
+    ]
+
+    def answer_fn(task, payload):
+        # known genus fields are not repeated by the LLM
+        answers = [{k: v for k, v in item.items() if not k.startswith("gender_")} for item in payload]
+        for a in answers:
+            a["score"] = 0.5
+        answers[0]["german"] = "Gemeiner Schimpanse"
+        return list(reversed(answers))
+
+    sent = stub_llm(monkeypatch, answer_fn)
+    results = main.call_model_batch(batch, lean=True)
+    task, payload = sent[0]
+    assert task == "json_extraction_lean"
+    assert [item["id"] for item in payload] == [0, 1]
+    by_id = {r["id"]: r for r in results}
+    assert by_id[0]["german"] == "Gemeiner Schimpanse"
+    assert (by_id[0]["gender_german"], by_id[0]["gender_russian"]) == ("M", "M")
+    assert (by_id[1]["gender_german"], by_id[1]["gender_russian"]) == ("F", "F")
+
+
+def test_prompt_passes_id_through():
+    """
+    test ensures that both extraction prompts ask for the id as passthrough field
+    """
+    prepared, _ = main.prepare_batch([{"category": "", "latin": "Pan", "german": "Schimpanse",
+                                       "russian": "шимпанзе"}])
+    for lean in (False, True):
+        task, task_schema, task_example = main.task_for(lean)
+        prompt = main.gemini.render_prompt(task, payload=prepared, schema=task_schema, example=task_example)
+        assert "Übernehme die Felder id, category, latin, german, russian" in prompt
+        assert '"id": 0' in prompt
+
+
+
+def lean_answers(task, payload):
+    return [{k: v for k, v in item.items() if not k.startswith("gender_")}
+            | {"gender_german": "M", "gender_russian": "M", "score": 0.1 * (item["id"] + 1)}
+            for item in payload]
+
+
+def test_lean_run_asks_without_reasons(tmp_path, monkeypatch):
+    """
+    test ensures that --lean uses the lean prompt and writes the results
+    without reasons and without the batch-local id
+    """
+    csv_a, csv_b, out = tmp_path / "a.csv", tmp_path / "b.csv", tmp_path / "out.json"
+    csv_a.write_text("Affen:\nPan troglodytes,Schimpanse,Обыкновенный шимпанзе\n", encoding="utf-8")
+    csv_b.write_text("Raubtiere:\nUrsus maritimus,Eisbär,Белый медведь\n", encoding="utf-8")
+    sent = stub_llm(monkeypatch, lean_answers)
+    monkeypatch.setattr(main.sys, "argv", ["updater", "--csv", str(csv_a), "--csv2", str(csv_b),
+                                           "--lean", "--output", str(out), "--max-retries", "0"])
+    main.main()
+    assert [task for task, _ in sent] == ["json_extraction_lean"]
+    written = json.loads(out.read_text(encoding="utf-8"))
+    assert [r["latin"] for r in written] == ["Ursus maritimus", "Pan troglodytes"]
+    assert all("reason" not in r and "gender_reason" not in r and "id" not in r for r in written)
+
+
+def three_rows(tmp_path):
+    csv_a, csv_b = tmp_path / "a.csv", tmp_path / "b.csv"
+    csv_a.write_text("Affen:\nPan troglodytes,Schimpanse,Обыкновенный шимпанзе\n"
+                     "Gorilla gorilla,Westlicher Gorilla,Западная горилла\n", encoding="utf-8")
+    csv_b.write_text("Raubtiere:\nUrsus maritimus,Eisbär,Белый медведь\n", encoding="utf-8")
+    return ["updater", "--csv", str(csv_a), "--csv2", str(csv_b), "--lean", "--batch-size", "1",
+            "--max-retries", "0", "--output", str(tmp_path / "out.json")]
+
+
+def billed_answers(task, payload):
+    # the stub bills like the client, 1000 tokens per request
+    main.metrics.LLM_TOKENS.inc(1000, kind="input")
+    return lean_answers(task, payload)
+
+
+def test_process_rows_stops_at_budget(monkeypatch):
+    """
+    test ensures that process_rows stops between batches at the token
+    budget and keeps the open rows in budget.pending
+    """
+    sent = stub_llm(monkeypatch, billed_answers)
+    store = main.RecordStore()
+    store.extend([{"category": "Affen", "latin": f"Species {i}", "german": f"Art {i}", "russian": f"Вид {i}"}
+                  for i in range(4)])
+    budget = main.Budget(max_tokens=2500, used_tokens=main.metrics.LLM_TOKENS.total)
+    ordered = main.process_rows(store, range(4), batch_size=1, max_retries=1, lean=True, budget=budget)
+    # 2 * 1000 used, a third batch would need 3000
+    assert len(sent) == 2 and len(ordered) == 2
+    assert "Token-Budget" in budget.stopped
+    assert [r["latin"] for r in budget.pending] == ["Species 2", "Species 3"]
+    # a budget below the first batch sends nothing
+    sent.clear()
+    budget = main.Budget(max_tokens=10, used_tokens=main.metrics.LLM_TOKENS.total)
+    assert main.process_rows(store, [3], batch_size=1, max_retries=0, lean=True, budget=budget) == []
+    assert sent == [] and budget.pending
+
+
+def test_process_rows_fills_renamed_row_by_id(monkeypatch):
+    """
+    test ensures that an answer with a changed name fills its row through
+    the batch-local id, without a phantom row and without a retry
+    """
+    def answer_fn(task, payload):
+        answers = lean_answers(task, payload)
+        answers[0]["german"] = "Gemeiner Schimpanse"
+        return answers
+
+    sent = stub_llm(monkeypatch, answer_fn)
+    store = main.RecordStore()
+    store.extend([{"category": "Affen", "latin": "Pan troglodytes", "german": "Schimpanse",
+                   "russian": "Обыкновенный шимпанзе"},
+                  {"category": "Affen", "latin": "Gorilla gorilla", "german": "Westlicher Gorilla",
+                   "russian": "Западная горилла"}])
+    ordered = main.process_rows(store, range(2), batch_size=10, max_retries=2, lean=True)
+    assert len(sent) == 1 and len(store) == 2
+    assert sorted(ordered) == [0, 1]
+    assert [r["german"] for r in store.result_dicts([0])] == ["Schimpanse"]
+
+
+def test_budget_checkpoint_and_resume(tmp_path, monkeypatch):
+    """
+    test ensures that a stopped run writes the partial result and the open
+    rows to out.pending.json, --resume asks only for the open rows and
+    merges both results, the checkpoint is removed afterwards
+    """
+    argv = three_rows(tmp_path)
+    out, checkpoint = tmp_path / "out.json", tmp_path / "out.pending.json"
+    sent = stub_llm(monkeypatch, billed_answers)
+    monkeypatch.setattr(main.sys, "argv", argv + ["--budget-tokens", "2500"])
+    main.main()
+    assert len(sent) == 2
+    assert len(json.loads(out.read_text(encoding="utf-8"))) == 2
+    pending = json.loads(checkpoint.read_text(encoding="utf-8"))
+    assert len(pending) == 1
+
+    sent.clear()
+    monkeypatch.setattr(main.sys, "argv", argv + ["--resume"])
+    main.main()
+    assert [[item["latin"] for item in payload] for _, payload in sent] == [[pending[0]["latin"]]]
+    written = json.loads(out.read_text(encoding="utf-8"))
+    assert sorted(r["latin"] for r in written) == ["Gorilla gorilla", "Pan troglodytes", "Ursus maritimus"]
+    assert not checkpoint.exists()
+
+
+def test_resume_without_checkpoint_keeps_output(tmp_path, monkeypatch):
+    """
+    test ensures that --resume without checkpoint stops with an error
+    instead of asking for all rows and overwriting the output
+    """
+    out = tmp_path / "out.json"
+    out.write_text("[]", encoding="utf-8")
+    sent = stub_llm(monkeypatch, billed_answers)
+    monkeypatch.setattr(main.sys, "argv", three_rows(tmp_path) + ["--resume"])
+    with pytest.raises(SystemExit):
+        main.main()
+    assert sent == [] and out.read_text(encoding="utf-8") == "[]"
+
+
+def test_unreadable_json_input_exits(tmp_path, monkeypatch, capsys):
+    """
+    test ensures that a --json path that can not be read ends with an
+    error message instead of a traceback
+    """
+    monkeypatch.setattr(main.sys, "argv", ["updater", "--json", str(tmp_path),
+                                           "--output", str(tmp_path / "out.json")])
+    with pytest.raises(SystemExit):
+        main.main()
+    assert "Fehler" in capsys.readouterr().err
+
+
+def test_dry_run_sends_and_writes_nothing(tmp_path, monkeypatch, capsys):
+    """
+    test ensures that --dry-run only prints the estimate, without LLM
+    calls and without output file
+    """
+    sent = stub_llm(monkeypatch, billed_answers)
+    monkeypatch.setattr(main.sys, "argv", three_rows(tmp_path) + ["--dry-run", "--budget-tokens", "10"])
+    main.main()
+    assert sent == []
+    assert not (tmp_path / "out.json").exists()
+    err = capsys.readouterr().err
+    assert "Probelauf: 3 Zeilen in 3 Anfragen" in err
+    assert "über --budget-tokens 10" in err
+
+
+def test_call_reason_batch_uses_local_reason_only_for_same_genus(monkeypatch):
+    """
+    test ensures that the local gender_reason is only used if the rules give
+    the stored genus, otherwise the LLM is asked for it
+    """
+    sent = stub_llm(monkeypatch, lambda task, payload: [])
+    names = {"category": "Affen", "latin": "Pan troglodytes", "german": "Schimpanse",
+             "russian": "Обыкновенный шимпанзе", "score": 0.9}
+    same = {**names, "gender_german": "M", "gender_russian": "m"}
+    other = {**names, "gender_german": "F", "gender_russian": "M"}
+    main.call_reason_batch([same, other])
+    task, payload = sent[0]
+    assert task == "reason_extraction"
+    assert same["gender_reason"] and "needs_gender_reason" not in payload[0]
+    assert "gender_reason" not in other and payload[1]["needs_gender_reason"] is True
+    assert [item["id"] for item in payload] == [0, 1]
+
+
+def test_reasons_subcommand_fills_top_records(tmp_path, monkeypatch):
+    """
+    test ensures that the reasons subcommand asks only for the top records
+    without reason and stores the answers by id, also with changed names
+    """
+    path = tmp_path / "gemini_output.json"
+    records = [
+        {"category": "Affen", "latin": "Pan troglodytes", "german": "Schimpanse",
+         "russian": "Обыкновенный шимпанзе", "gender_russian": "M", "gender_german": "M", "score": 0.9},
+        {"category": "Affen", "latin": "Lemur catta", "german": "Katta",
+         "russian": "Кошачий лемур", "gender_russian": "M", "gender_german": "M", "score": 0.4},
+    ]
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+    def answer_fn(task, payload):
+        return [{"id": item["id"], "latin": item["latin"], "german": "Gemeiner " + item["german"],
+                 "russian": item["russian"], "reason": "Werkzeuggebrauch [Quelle]"} for item in payload]
+
+    sent = stub_llm(monkeypatch, answer_fn)
+    main.reasons(["--input", str(path), "--top", "1"])
+    assert [[item["latin"] for item in payload] for _, payload in sent] == [["Pan troglodytes"]]
+    written = json.loads(path.read_text(encoding="utf-8"))
+    assert written[0]["reason"] == "Werkzeuggebrauch [Quelle]"
+    assert written[0]["german"] == "Schimpanse" and written[0]["gender_reason"]
+    assert "reason" not in written[1]
+
+
+def test_lean_and_reason_templates():
+    """
+    test ensures that the lean prompt asks for no reasons and the reason
+    prompt asks for gender_reason only where needed
+    """
+    prepared, _ = main.prepare_batch([{"category": "", "latin": "Pan", "german": "Schimpanse",
+                                       "russian": "шимпанзе"}])
+    task, task_schema, task_example = main.task_for(lean=True)
+    lean = main.gemini.render_prompt(task, payload=prepared, schema=task_schema, example=task_example)
+    assert 'KEINE Felder "reason" oder "gender_reason"' in lean
+    assert '"gender_reason"' not in lean.rsplit("schema:", 1)[1]
+    reason = main.gemini.render_prompt("reason_extraction", payload=[{"id": 0, "latin": "Pan",
+                                                                      "needs_gender_reason": True}],
+                                       schema=main.reason_schema, example=main.reason_example)
+    assert '"needs_gender_reason": true' in reason
+    assert "Ändere den score NICHT" in reason
+
+
 if __name__ == "__main__":
     assert True
@@ -0,0 +1,70 @@
+import json
+from itertools import islice
+
+import pytest
+
+from updater.updater.merge import match_results, merge_sorted_runs, top_k, write_json_stream
+from updater.updater.records import RecordStore
+
+
+def test_batches_merge_to_global_order():
+    """
+    test ensures that score sorted batch runs merge into one globally
+    sorted list and that equal scores keep the batch order (stable)
+    Returns:
+        None: Asserts the merged order
+    """
+    store = RecordStore()
+    store.extend({"latin": latin, "german": latin, "russian": latin} for latin in "ABCDE")
+    batch1 = [{"latin": "A", "score": 0.2}, {"latin": "B", "score": 0.9}, "kein Objekt"]
+    batch2 = [{"latin": "C", "score": 0.5}, {"latin": "D", "score": 0.9}, {"latin": "E"}]
+    runs = [store.add_run([0, 1], [{**r, "id": i} for i, r in enumerate(batch1[:2])] + batch1[2:]),
+            store.add_run([2, 3, 4], batch2)]
+    assert runs[0] == [1, 0]
+    merged = list(merge_sorted_runs(runs, store.score))
+    assert [store.rows[i].latin for i in merged] == ["B", "D", "C", "A", "E"]
+    assert [store.rows[i].latin for i in islice(merge_sorted_runs(runs, store.score), 2)] == ["B", "D"]
+
+
+def test_top_k_from_unsorted_stream():
+    """
+    test ensures that top_k returns the k highest scores of a generator
+    Returns:
+        None: Asserts the selected records
+    """
+    stream = ({"latin": str(i), "score": (i * 7 % 10) / 10} for i in range(10))
+    assert [r["score"] for r in top_k(stream, 3)] == [0.9, 0.8, 0.7]
+    assert top_k([], 3) == []
+    assert top_k([{"score": 1}], 0) == []
+
+
+def test_match_results_by_id_position_and_key():
+    """
+    test ensures that answers are assigned by id, then by position and
+    only without both by the record key
+    """
+    batch = [{"latin": "A"}, {"latin": "B"}]
+    key = lambda r: r.get("latin")  # noqa: E731
+    by_id = [{"id": 1, "latin": "B2"}, {"id": 0, "latin": "A2"}, {"id": 7, "latin": "X"}]
+    assert match_results(batch, by_id, key) == [by_id[1], by_id[0]]
+    by_position = [{"latin": "A2"}, {"latin": "B2"}]
+    assert match_results(batch, by_position, key) == by_position
+    assert match_results(batch, [{"latin": "B"}], key) == [None, {"latin": "B"}]
+    assert match_results(batch, "kaputt", key) == [None, None]
+
+
+def test_write_json_stream_keeps_old_file_on_error(tmp_path):
+    """
+    test ensures that a failing writer leaves the previous file and no temporary file
+    """
+    path = tmp_path / "out.json"
+    write_json_stream(path, [{"latin": "A"}])
+
+    def broken():
+        yield {"latin": "B"}
+        raise RuntimeError("abgebrochen")
+
+    with pytest.raises(RuntimeError):
+        write_json_stream(path, broken())
+    assert [r["latin"] for r in json.loads(path.read_text(encoding="utf-8"))] == ["A"]
+    assert list(tmp_path.iterdir()) == [path]
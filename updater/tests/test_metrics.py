@@ -0,0 +1,111 @@
+import urllib.request
+
+from updater.updater.metrics import MetricsRegistry
+
+
+def test_prometheus_text():
+    """
+    test ensures that counters with labels and histograms are exported
+    in the prometheus text format
+    Returns:
+        None: Asserts the sample lines
+    """
+    registry = MetricsRegistry()
+    errors = registry.counter("llm_errors_total", "errors by status")
+    latency = registry.histogram("llm_seconds", "latency", buckets=(1, 5))
+    errors.inc(status=429)
+    errors.inc(status=429)
+    errors.inc(status=500)
+    latency.observe(0.5)
+    latency.observe(3)
+    latency.observe(10)
+
+    text = registry.to_prometheus()
+    assert "# TYPE llm_errors_total counter" in text
+    assert 'llm_errors_total{status="429"} 2' in text
+    assert 'llm_errors_total{status="500"} 1' in text
+    assert 'llm_seconds_bucket{le="1"} 1' in text
+    assert 'llm_seconds_bucket{le="5"} 2' in text
+    assert 'llm_seconds_bucket{le="+Inf"} 3' in text
+    assert "llm_seconds_count 3" in text
+    assert latency.quantile(0.5) == 5
+
+
+def test_write_and_serve(tmp_path):
+    """
+    test ensures that the metrics are written to a file and served locally
+    Args:
+        tmp_path: pytest fixture for the output file
+    Returns:
+        None: Asserts that file and endpoint contain the counter
+    """
+    registry = MetricsRegistry()
+    registry.counter("rows_total", "rows").inc(7)
+    out = tmp_path / "updater.prom"
+    registry.write(str(out))
+    assert "rows_total 7" in out.read_text(encoding="utf-8")
+
+    server = registry.serve(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as r:
+            assert "rows_total 7" in r.read().decode("utf-8")
+    finally:
+        server.shutdown()
+
+
+def test_every_post_is_counted(monkeypatch):
+    """
+    test ensures that every http post counts as a request and with its
+    tokens, also the losing duplicate of a hedged request, that the http
+    timeout ends at the deadline and that the cache rate is only shown
+    when there were lookups
+    """
+    import threading
+    import time
+
+    import pytest
+
+    from updater.updater import metrics
+    # requests, jinja2 and pydantic are not installed everywhere
+    gemini_api = pytest.importorskip("updater.updater.llm_support.gemini_api")
+    from updater.updater.llm_support.hedging import HedgingPolicy
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"candidates": [{"content": {"parts": [{"text": "[]"}]}}],
+                    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 2}}
+
+    calls = []
+    lock = threading.Lock()
+
+    def post(*args, **kwargs):
+        with lock:
+            calls.append(kwargs["timeout"])
+            first = len(calls) == 1
+        # the first post hangs, the duplicate answers at once
+        if first:
+            time.sleep(0.3)
+        return Response()
+
+    monkeypatch.setattr(gemini_api.requests, "post", post)
+    client = gemini_api.GeminiLlmInstance.__new__(gemini_api.GeminiLlmInstance)
+    client.GEMINI_API_URL, client.GEMINI_API_KEY = "http://localhost", "key"
+    client.usage_logging = lambda tokens, valid: None
+    client.hedging = HedgingPolicy(percentile=50, max_hedge_rate=1.0, min_samples=1)
+    client.hedging.record(0.01)
+    client.request_timeout, client.deadline = 120.0, time.monotonic() + 5
+    before, tokens_before = metrics.LLM_REQUESTS.total(), metrics.LLM_TOKENS.total()
+    client.query("prompt")
+    assert client.hedging.stats()["hedged"] == 1
+    assert metrics.LLM_REQUESTS.total() - before == 2
+    assert all(timeout <= 5 for timeout in calls)
+    # the losing post is billed when its answer arrives
+    deadline = time.monotonic() + 2
+    while metrics.LLM_TOKENS.total() - tokens_before < 24 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert metrics.LLM_TOKENS.total() - tokens_before == 24
+    if not metrics.CACHE_HITS.total() + metrics.CACHE_MISSES.total():
+        assert "Cache-Trefferquote: -" in metrics.summary()
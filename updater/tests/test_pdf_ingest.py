@@ -0,0 +1,135 @@
+import csv
+import random
+from pathlib import Path
+
+import pytest
+
+from updater.updater.pdf_ingest import Cell, cells_to_rows, extract_pdf_rows
+
+DATA = Path(__file__).resolve().parents[1] / "updater"
+
+# fragments as PyPDF2 returns them for "Neue Datenbank.pdf": words split at
+# ligatures, spaces as fragments of their own, wrapped cells on a second line
+REAL_CELLS = [
+    Cell(0, 250.77, 1076.34, 0.0, "Tiernamen Datenbank", 0, 12.0),
+    Cell(0, 54.17, 1052.41, 0.0, "Tiernamen Latein", 1, 10.0),
+    Cell(0, 200.66, 1052.41, 0.0, "Tiername Deutsch", 2, 10.0),
+    Cell(0, 384.95, 1052.41, 0.0, "Tiername Russisch", 3, 10.0),
+    Cell(0, 200.86, 1031.9, 0.0, "A", 4, 10.0),
+    Cell(0, 200.86, 1031.9, 6.85, "ﬀ", 5, 10.0),
+    Cell(0, 200.86, 1031.9, 13.21, "en", 6, 10.0),
+    Cell(0, 200.86, 1031.9, 24.88, ":", 7, 10.0),
+    Cell(0, 54.17, 1011.84, 0.0, "Cercopithecus cephus ", 8, 10.0),
+    Cell(0, 200.86, 1011.79, 0.0, "Blaumaulmeerkatze", 9, 10.0),
+    Cell(0, 200.86, 1011.79, 88.16, " ", 10, 11.0),
+    Cell(0, 384.95, 1011.79, 0.0, "Голуболицая", 11, 10.0),
+    Cell(0, 384.95, 1011.79, 0.0, " ", 12, 10.0),
+    Cell(0, 384.95, 1011.79, 0.0, "мартышка", 13, 10.0),
+    Cell(0, 54.17, 991.55, 0.0, "Ateles fusciceps ru", 14, 10.0),
+    Cell(0, 54.17, 991.55, 91.09, "ﬁ", 15, 10.0),
+    Cell(0, 54.17, 991.55, 97.2, "ventris", 16, 10.0),
+    Cell(0, 200.86, 991.5, 0.0, "Braunkopf-Klammera", 17, 10.0),
+    Cell(0, 200.86, 991.5, 95.77, "ﬀ", 18, 10.0),
+    Cell(0, 200.86, 991.5, 101.54, "e ", 19, 10.0),
+    Cell(0, 384.95, 991.5, 0.0, "Буроголовая", 20, 10.0),
+    Cell(0, 384.95, 991.5, 0.0, " ", 21, 10.0),
+    Cell(0, 384.95, 991.5, 0.0, "коата", 22, 10.0),
+    Cell(1, 54.17, 496.51, 0.0, "Gira", 127, 10.0),
+    Cell(1, 54.17, 496.51, 19.8, "ﬀ", 128, 10.0),
+    Cell(1, 54.17, 496.51, 26.16, "a camelopardalis ", 129, 10.0),
+    Cell(1, 54.17, 484.51, 0.0, "reticulata ", 130, 10.0),
+    Cell(1, 200.86, 496.46, 0.0, "Netzgira", 131, 10.0),
+    Cell(1, 200.86, 496.46, 37.2, "ﬀ", 132, 10.0),
+    Cell(1, 200.86, 496.46, 42.97, "e", 133, 10.0),
+    Cell(1, 384.95, 496.46, 0.0, "Сетчатый", 134, 10.0),
+    Cell(1, 384.95, 496.46, 0.0, " ", 135, 10.0),
+    Cell(1, 384.95, 496.46, 0.0, "жираф", 136, 10.0),
+]
+
+
+def test_cells_to_rows_columns_and_categories():
+    """
+    test ensures that pdf fragments are grouped into table rows, assigned
+    to the latin/german/russian columns and that category labels are
+    carried over page breaks
+    Returns:
+        None: Asserts the records in the extract_rows format
+    """
+    cells = [
+        # page title and column titles
+        Cell(0, 250.77, 1076.3, 0, "Tiernamen Datenbank"),
+        Cell(0, 54.17, 1052.4, 0, "Tiernamen Latein"),
+        Cell(0, 200.86, 1052.4, 0, "Tiername Deutsch"),
+        Cell(0, 384.95, 1052.4, 0, "Tiername Russisch"),
+        Cell(0, 200.86, 1031.9, 0, "Affen:"),
+        # one cell split into fragments, slightly different baselines per column
+        Cell(0, 54.17, 991.55, 91.09, "fi"),
+        Cell(0, 54.17, 991.55, 0, "Ateles fusciceps ru"),
+        Cell(0, 54.17, 991.55, 97.2, "ventris"),
+        Cell(0, 200.86, 991.50, 0, "Braunkopf-Klammeraffe "),
+        Cell(0, 384.95, 991.50, 0, "Буроголовая коата"),
+        Cell(0, 200.86, 750.7, 0, "Raubtiere"),
+        Cell(0, 54.17, 730.6, 0, "Ursus maritimus"),
+        Cell(0, 200.86, 730.6, 0, "Eisbär "),
+        Cell(0, 384.95, 730.6, 0, "Белый медведь"),
+        # next page, category continues
+        Cell(1, 54.17, 1072.1, 0, "Suricata suricatta"),
+        Cell(1, 200.86, 1072.1, 0, "Erdmännchen"),
+        Cell(1, 384.95, 1072.1, 0, "Сурикат"),
+    ]
+    rows = cells_to_rows(list(reversed(cells)))
+    assert rows == [
+        {"category": "Affen", "latin": "Ateles fusciceps rufiventris",
+         "german": "Braunkopf-Klammeraffe", "russian": "Буроголовая коата"},
+        {"category": "Raubtiere", "latin": "Ursus maritimus",
+         "german": "Eisbär", "russian": "Белый медведь"},
+        {"category": "Raubtiere", "latin": "Suricata suricatta",
+         "german": "Erdmännchen", "russian": "Сурикат"},
+    ]
+
+
+def test_cells_to_rows_real_fragments():
+    """
+    test ensures that the fragments of the real pdf give the names of the
+    csv in any input order: spaces between fragments at the same position
+    are kept, ligatures are resolved and wrapped cells are joined
+    """
+    expected = [
+        {"category": "Affen", "latin": "Cercopithecus cephus",
+         "german": "Blaumaulmeerkatze", "russian": "Голуболицая мартышка"},
+        {"category": "Affen", "latin": "Ateles fusciceps rufiventris",
+         "german": "Braunkopf-Klammeraffe", "russian": "Буроголовая коата"},
+        {"category": "Affen", "latin": "Giraffa camelopardalis reticulata",
+         "german": "Netzgiraffe", "russian": "Сетчатый жираф"},
+    ]
+    cells = list(REAL_CELLS)
+    assert cells_to_rows(cells) == expected
+    assert cells_to_rows(list(reversed(cells))) == expected
+    random.Random(7).shuffle(cells)
+    assert cells_to_rows(cells) == expected
+
+
+def test_cells_to_rows_word_gap():
+    """
+    test ensures that fragments clearly apart are separate words
+    """
+    cells = [Cell(0, 54.17, 500.0, 0.0, "Pan", 0), Cell(0, 54.17, 500.0, 40.0, "troglodytes", 1),
+             Cell(0, 200.86, 500.0, 0.0, "Schimpanse", 2), Cell(0, 384.95, 500.0, 0.0, "Шимпанзе", 3)]
+    assert cells_to_rows(cells)[0]["latin"] == "Pan troglodytes"
+
+
+def test_extract_pdf_rows_matches_csv():
+    """
+    test ensures that the rows read from the pdf database have the same
+    names as the manually converted csv files
+    """
+    pytest.importorskip("PyPDF2")
+    keys = set()
+    for name in ("Neue DatenbankCSV.csv", "Neue DatenbankCSV1.csv"):
+        with (DATA / name).open(encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                names = tuple(c.strip() for c in row[:3])
+                if len(names) == 3 and names[0] and not names[0].lower().startswith("tiername"):
+                    keys.add(names)
+    rows = extract_pdf_rows(DATA / "Neue Datenbank.pdf", workers=1)
+    assert {(r["latin"], r["german"], r["russian"]) for r in rows} == keys
@@ -0,0 +1,77 @@
+import json
+
+from updater.updater.merge import merge_sorted_runs, write_json_stream
+from updater.updater.records import RecordStore
+
+
+def row(latin, category="Affen"):
+    return {"category": category, "latin": latin, "german": f"{latin} de", "russian": f"{latin} ru"}
+
+
+def answer(record, score, lean=False):
+    result = {**record, "gender_russian": "M", "gender_german": "M", "score": score}
+    if not lean:
+        result.update(reason="Quelle [1]", gender_reason="Genusregel")
+    return result
+
+
+def test_store_shares_rows():
+    """
+    test ensures that duplicate rows get the same id and the category
+    string is shared by all rows
+    """
+    store = RecordStore()
+    assert store.extend([row("Pan troglodytes"), row("Gorilla gorilla"), row("Pan troglodytes")]) == 3
+    assert len(store) == 2
+    assert store.id_of(row("Gorilla gorilla")) == 1
+    category = "".join(["Af", "fen"])
+    store.add(row("Pongo abelii", category))
+    assert store.rows[2].category is store.rows[0].category
+    assert store.batch([1]) == [row("Gorilla gorilla")]
+
+
+def test_results_keep_output_format(tmp_path):
+    """
+    test ensures that results stored per row id are written exactly like
+    the dict records of the LLM answer, full and lean
+    Returns:
+        None: Asserts identical json output
+    """
+    store = RecordStore()
+    store.extend([row("Pan troglodytes"), row("Gorilla gorilla"), row("Macaca mulatta", "")])
+    answers = [answer(row("Gorilla gorilla"), 0.8), answer(row("Pan troglodytes"), 0.95),
+               answer({**row("Macaca mulatta", ""), "category": "Affen"}, "0.5", lean=True)]
+    run = store.add_run([1, 0, 2], answers + ["kein Objekt"])
+    assert run == [0, 1, 2]
+    # the first answer for a row wins
+    assert store.add_run([0], [answer(row("Pan troglodytes"), 0.1)]) == []
+
+    write_json_stream(tmp_path / "a.json", store.result_dicts(run))
+    expected = sorted(answers, key=lambda r: -float(r["score"]))
+    assert (tmp_path / "a.json").read_text(encoding="utf-8") == json.dumps(expected, ensure_ascii=False, indent=2)
+
+
+def test_changed_names_fill_row_by_id():
+    """
+    test ensures that an answer with changed names fills its row through
+    the batch-local id, without a new row and with the names of the row
+    """
+    store = RecordStore()
+    store.extend([row("Pan troglodytes"), row("Gorilla gorilla")])
+    changed = answer({**row("Gorilla gorilla"), "german": "Westlicher Gorilla"}, 0.9)
+    run = store.add_run([1, 0], [{**changed, "id": 0}])
+    assert run == [1] and 0 not in store.results
+    assert len(store) == 2
+    # the batch-local id of the prompt is not written
+    assert list(store.result_dicts(run)) == [answer(row("Gorilla gorilla"), 0.9)]
+
+
+def test_merge_runs_of_ids():
+    """
+    test ensures that runs of row ids merge by the stored score
+    """
+    store = RecordStore()
+    store.extend([row(f"Species {i}") for i in range(4)])
+    first = store.add_run([0, 1], [answer(row("Species 0"), 0.9), answer(row("Species 1"), 0.2)])
+    second = store.add_run([2, 3], [answer(row("Species 2"), 0.5), answer(row("Species 3"), 0.9)])
+    assert list(merge_sorted_runs([first, second], store.score)) == [0, 3, 2, 1]
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+from updater.updater.records import record_key
+from updater.updater.service import MicroBatcher, create_server
+
+
+
+def fake_llm(calls):
+    """
+    fake call_model_batch that records each batch and scores every record
+    """
+    def batch_fn(batch):
+        calls.append([r["latin"] for r in batch])
+        return [dict(r, score=0.5) for r in batch]
+    return batch_fn
+
+
+def test_callers_share_one_batch_and_identical_keys_coalesce():
+    """
+    test ensures that records of one window are sent in one LLM call
+    and that an identical in-flight key is requested only once
+    Returns:
+        None: Asserts the number of LLM calls and the results
+    """
+    calls = []
+    batcher = MicroBatcher(fake_llm(calls), record_key, window=0.2, max_batch=10)
+    a = {"category": "", "latin": "Pan", "german": "Schimpanse", "russian": "шимпанзе"}
+    b = {"category": "", "latin": "Gorilla", "german": "Gorilla", "russian": "горилла"}
+    f1 = batcher.submit(a)
+    f2 = batcher.submit(dict(a))
+    f3 = batcher.submit(b)
+    assert f1 is f2
+    assert f1.result(timeout=5)["score"] == 0.5
+    assert f3.result(timeout=5)["latin"] == "Gorilla"
+    assert calls == [["Pan", "Gorilla"]]
+    batcher.close()
+
+
+def test_full_batch_is_sent_without_waiting():
+    """
+    test ensures that a full batch does not wait for the window
+    Returns:
+        None: Asserts two LLM calls for three records with max_batch 2
+    """
+    calls = []
+    batcher = MicroBatcher(fake_llm(calls), record_key, window=60, max_batch=2)
+    records = [{"category": "", "latin": n, "german": n, "russian": n} for n in "ABC"]
+    futures = [batcher.submit(r) for r in records]
+    assert futures[0].result(timeout=5)["latin"] == "A"
+    batcher.close()
+    assert [f.result(timeout=5)["latin"] for f in futures] == ["A", "B", "C"]
+    assert calls == [["A", "B"], ["C"]]
+
+
+def test_http_enrich_single_and_list():
+    """
+    test ensures that the service accepts a single record and a list
+    Returns:
+        None: Asserts the http answers
+    """
+    calls = []
+    batcher = MicroBatcher(fake_llm(calls), record_key, window=0.01, max_batch=10)
+    server = create_server(batcher, port=0, max_records=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/enrich"
+
+    def post(body):
+        req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=5) as r:
+                return r.status, json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    try:
+        status, body = post({"latin": "Pan", "german": "Schimpanse", "russian": "шимпанзе"})
+        assert status == 200 and body["score"] == 0.5 and body["category"] == ""
+        status, body = post([{"latin": "A"}, {"latin": "B"}])
+        assert status == 200 and [r["latin"] for r in body] == ["A", "B"]
+        assert post([{"latin": "A"}] * 3)[0] == 413
+        assert post({"category": "Affen"})[0] == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.close()
+
+
+def test_results_match_by_id_when_names_change():
+    """
+    test ensures that an answer with changed names is still assigned to its
+    record through the batch-local id and the id is not returned
+    """
+    def batch_fn(batch):
+        answers = [dict(r, id=i, score=0.5) for i, r in enumerate(batch)]
+        answers[0]["german"] = "Gemeiner Schimpanse"
+        return list(reversed(answers))
+
+    batcher = MicroBatcher(batch_fn, record_key, window=60, max_batch=2)
+    a = {"category": "", "latin": "Pan", "german": "Schimpanse", "russian": "шимпанзе"}
+    b = {"category": "", "latin": "Gorilla", "german": "Gorilla", "russian": "горилла"}
+    results = batcher.enrich([a, b], timeout=5)
+    assert [r["latin"] for r in results] == ["Pan", "Gorilla"]
+    assert results[0]["german"] == "Gemeiner Schimpanse" and "id" not in results[0]
+    batcher.close()
+
+
+def test_enrich_has_one_deadline_and_missing_answer_is_502():
+    """
+    test ensures that enrich waits at most the timeout for all records together
+    and that a record without answer is reported with status 502
+    """
+    release = threading.Event()
+
+    def slow(batch):
+        # A answers shortly before the deadline, the others hang
+        if batch[0]["latin"] == "A":
+            time.sleep(0.4)
+        else:
+            release.wait(5)
+        return [dict(r, score=0.5) for r in batch]
+
+    batcher = MicroBatcher(slow, record_key, window=0.01, max_batch=1)
+    records = [{"category": "", "latin": n, "german": n, "russian": n} for n in "ABC"]
+    start = time.monotonic()
+    with pytest.raises(FutureTimeout):
+        batcher.enrich(records, timeout=0.5)
+    assert time.monotonic() - start < 0.8
+    release.set()
+    batcher.close()
+
+    batcher = MicroBatcher(lambda batch: [], record_key, window=0.01, max_batch=10)
+    server = create_server(batcher, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/enrich"
+    req = urllib.request.Request(url, data=json.dumps({"latin": "Pan"}).encode("utf-8"), method="POST")
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(req, timeout=5)
+        assert e.value.code == 502
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.close()
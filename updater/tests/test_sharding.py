@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from updater.updater.merge import load_run, merge_sorted_runs, unique_by_key, write_json_stream
+from updater.updater.records import record_key
+from updater.updater.sharding import parse_shard, select_shard, shard_output_path, stable_shard
+
+
+
+def test_parse_shard():
+    """
+    test ensures that valid shard options are parsed and invalid ones rejected
+    """
+    assert parse_shard("1/4") == (1, 4)
+    for value in ("4/4", "-1/2", "a/b", "3"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_shards_partition_rows():
+    """
+    test ensures that every row lands in exactly one shard and that
+    the assignment does not depend on the process
+    Returns:
+        None: Asserts partition and a fixed shard index
+    """
+    rows = [{"latin": f"Species {i}", "russian": "", "german": ""} for i in range(100)]
+    shards = [select_shard(rows, i, 3, record_key) for i in range(3)]
+    assert sorted(r["latin"] for s in shards for r in s) == sorted(r["latin"] for r in rows)
+    assert all(shards)
+    # sha1 based, stable across runs and machines
+    assert stable_shard(("Pan troglodytes", "", ""), 4) == stable_shard(("Pan troglodytes", "", ""), 4)
+
+
+def test_merge_shard_outputs(tmp_path):
+    """
+    test ensures that shard outputs are merged by score and duplicates
+    keep the record with the higher score
+    Args:
+        tmp_path: pytest fixture for the shard files
+    Returns:
+        None: Asserts order and conflict resolution
+    """
+    shard0 = [{"latin": "A", "score": 0.9}, {"latin": "C", "score": 0.4}]
+    shard1 = [{"latin": "B", "score": 0.7}, {"latin": "A", "score": 0.5}, {"latin": "D", "score": 0.1}]
+    paths = []
+    for i, data in enumerate((shard0, shard1)):
+        path = shard_output_path(tmp_path / "gemini_output.json", i, 2)
+        path.write_text(json.dumps(data), encoding="utf-8")
+        paths.append(path)
+    assert paths[0].name == "gemini_output.shard-0-of-2.json"
+
+    out = tmp_path / "gemini_output.json"
+    runs = [load_run(p) for p in paths]
+    count = write_json_stream(out, unique_by_key(merge_sorted_runs(runs), record_key))
+    merged = json.loads(out.read_text(encoding="utf-8"))
+    assert count == 4
+    assert [(r["latin"], r["score"]) for r in merged] == [("A", 0.9), ("B", 0.7), ("C", 0.4), ("D", 0.1)]
@@ -0,0 +1,45 @@
+import json
+
+from updater.updater.tracing import Tracer
+
+
+def test_disabled_tracer_collects_nothing():
+    """
+    test ensures that spans cost nothing while tracing is off
+    Returns:
+        None: Asserts that no events are collected
+    """
+    tracer = Tracer()
+    with tracer.span("stage"):
+        pass
+    assert tracer.events() == []
+
+
+def test_export_chrome_trace(tmp_path):
+    """
+    test ensures that spans are exported as complete chrome trace events
+    Args:
+        tmp_path: pytest fixture for the output file
+    Returns:
+        None: Asserts the event fields and the args set inside the span
+    """
+    tracer = Tracer()
+    tracer.enable()
+
+    @tracer.traced("decorated")
+    def work():
+        return 1
+
+    with tracer.span("batch", index=1) as span:
+        work()
+        span["results"] = 3
+
+    out = tmp_path / "trace.json"
+    tracer.export(str(out))
+    events = json.loads(out.read_text(encoding="utf-8"))["traceEvents"]
+    names = [e["name"] for e in events]
+    assert names == ["decorated", "batch"]
+    batch = events[1]
+    assert batch["ph"] == "X"
+    assert batch["args"] == {"index": 1, "results": 3}
+    assert batch["dur"] >= events[0]["dur"]
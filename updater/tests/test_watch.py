@@ -0,0 +1,50 @@
+import os
+
+from updater.updater.records import record_key
+from updater.updater.watch import FileWatcher, diff_rows
+
+
+
+def test_watcher_reports_content_changes_only(tmp_path):
+    """
+    test ensures that a touched file without new content is not reported,
+    a changed content is reported once
+    Args:
+        tmp_path: pytest fixture for the watched file
+    Returns:
+        None: Asserts the reported paths
+    """
+    path = tmp_path / "tiere.csv"
+    path.write_text("a,b,c\n", encoding="utf-8")
+    watcher = FileWatcher([path])
+    assert watcher.changed() == []
+
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert watcher.changed() == []
+
+    path.write_text("a,b,d\n", encoding="utf-8")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    assert watcher.changed() == [path]
+    assert watcher.changed() == []
+
+
+def test_diff_rows():
+    """
+    test ensures that new, changed and removed rows are detected
+    Returns:
+        None: Asserts affected rows and removed keys
+    """
+    old = [
+        {"category": "Affen", "latin": "A", "german": "a", "russian": "а"},
+        {"category": "Affen", "latin": "B", "german": "b", "russian": "б"},
+        {"category": "Affen", "latin": "C", "german": "c", "russian": "в"},
+    ]
+    new = [
+        old[0],
+        {"category": "Vögel", "latin": "B", "german": "b", "russian": "б"},
+        {"category": "Vögel", "latin": "D", "german": "d", "russian": "г"},
+    ]
+    affected, removed = diff_rows(old, new, record_key)
+    assert [r["latin"] for r in affected] == ["B", "D"]
+    assert removed == [("C", "в", "c")]
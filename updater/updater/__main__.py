@@ -1,16 +1,37 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import csv
 import json
+from itertools import islice
+import pstats
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Iterable, Tuple
+from time import perf_counter
+from typing import Any, Dict, List, Iterable, Iterator, Sequence, Tuple
 from updater.updater.llm_support.gemini_client import gemini
+from updater.updater.llm_support.hedging import HedgingPolicy
+from updater.updater.tracing import tracer
+from updater.updater import metrics
+from updater.updater.watch import FileWatcher, diff_rows
+from updater.updater.service import MicroBatcher, create_server, normalize_record
+from updater.updater.input import ExtractorResultError, iter_extractor_items
+from updater.updater.pdf_ingest import extract_pdf_rows
+from updater.updater.gender_rules import GenderResult, resolve_gender
+from updater.updater.sharding import parse_shard, select_shard, shard_output_path
+from updater.updater.merge import (load_run, match_results, merge_sorted_runs, score_of, top_k,
+                                   unique_by_key, write_json_stream)
+from updater.updater.records import RecordStore, record_key
+from updater.updater.budget import (GENDER_REASON_TOKENS, OUTPUT_TOKENS_PER_ROW, OUTPUT_TOKENS_PER_ROW_LEAN,
+                                    PRICE_INPUT_PER_M, PRICE_OUTPUT_PER_M, Budget, Estimate,
+                                    checkpoint_path)
 
 
 
 schema: Dict[str, str] = {
+    "id": "Laufende Nummer im Batch (unverändert übernehmen)",
     "category": "Tierkategorie (z.B. Affen, Raubtiere, ...)",
     "latin": "Wissenschaftlicher Name",
     "russian": "Russischer Name",
@@ -41,13 +62,53 @@ example: Dict[str, Any] = {
 }
 
 
+# kompakte Ausgabe ohne Begründungen (--lean)
+lean_schema: Dict[str, str] = {
+    **schema,
+    "score": "Menschenähnlichkeit zwischen 0.0 und 1.0"
+}
+
+lean_example: Dict[str, Any] = {
+    "input_example": example["input_example"],
+    "output_example": [
+        {k: v for k, v in item.items() if k not in ("reason", "gender_reason")}
+        for item in example["output_example"]
+    ]
+}
+
+# Begründungen nachträglich (Unterbefehl reasons)
+reason_schema: Dict[str, str] = {
+    "id": "Laufende Nummer im Batch (unverändert übernehmen)",
+    "latin": "Wissenschaftlicher Name (unverändert)",
+    "german": "Deutscher Name (unverändert)",
+    "russian": "Russischer Name (unverändert)",
+    "reason": "Begründung des score mit Quellen in eckigen Klammern",
+    "gender_reason": "Begründung des Genus, nur wenn needs_gender_reason gesetzt ist"
+}
+
+reason_example: Dict[str, Any] = {
+    "input_example": "Pan troglodytes, Schimpanse, Обыкновенный шимпанзе, score 0.95",
+    "output_example": [
+        {k: example["output_example"][0][k]
+         for k in ("latin", "german", "russian", "reason", "gender_reason")}
+    ]
+}
+
+
+@tracer.traced("extract_rows")
 def extract_rows(input_csv: Path) -> List[Dict[str, str]]:
     """
     Liest die Eingabe-CSV ein und erzeugt Records.
     Erwartete Spalten (flexibel): latin, german, russian (in dieser Reihenfolge).
     Kategorieschilder werden aus Zeilen mit ':' am Ende entnommen.
     """
-    data: List[Dict[str, str]] = []
+    return list(iter_rows(input_csv))
+
+
+def iter_rows(input_csv: Path) -> Iterator[Dict[str, str]]:
+    """
+    Wie extract_rows, liefert die Records aber einzeln, z.B. direkt in den RecordStore.
+    """
     category: str | None = None
 
     with input_csv.open(encoding="utf-8", newline="") as f:
@@ -70,13 +131,27 @@ def extract_rows(input_csv: Path) -> List[Dict[str, str]]:
             if not (latin or german or russian):
                 continue
 
-            data.append({
+            yield {
                 "category": category or "",
                 "latin": latin,
                 "german": german,
                 "russian": russian
-            })
-    return data
+            }
+
+
+def iter_json_rows(input_json: Path) -> Iterator[Dict[str, str]]:
+    """
+    Liest die Einträge eines Extractor-Ergebnisses (JSON-Liste) einzeln,
+    ohne die ganze Datei zu laden. Einträge ohne Namen werden übersprungen.
+    """
+    skipped = 0
+    for item in iter_extractor_items(input_json):
+        try:
+            yield normalize_record(item)
+        except ValueError:
+            skipped += 1
+    if skipped:
+        print(f"{skipped} ungültige Einträge in {input_json} übersprungen", file=sys.stderr)
 
 
 def chunk(lst: List[Any], n: int) -> Iterable[List[Any]]:
@@ -84,6 +159,7 @@ def chunk(lst: List[Any], n: int) -> Iterable[List[Any]]:
         yield lst[i:i+n]
 
 
+@tracer.traced("extract_json_array")
 def extract_json_array(s: str) -> List[Any]:
     """
     Robuste Extraktion: versucht erst json.loads(s),
@@ -139,16 +215,9 @@ def extract_json_array(s: str) -> List[Any]:
     raise ValueError("Konnte kein JSON-Array extrahieren")
 
 
-def record_key(r: Dict[str, Any]) -> Tuple[str, str, str]:
-    """Eindeutiger Key zur Duplikat-/Vollständigkeitsprüfung."""
-    return (
-        (r.get("latin") or "").strip(),
-        (r.get("russian") or "").strip(),
-        (r.get("german") or "").strip()
-    )
-
-
-def call_model_batch(batch_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _query_batch(batch_payload: List[Dict[str, Any]], task: str = "json_extraction",
+                 task_schema: Dict[str, str] = schema,
+                 task_example: Dict[str, Any] = example) -> List[Dict[str, Any]]:
     """
     Führt den LLM-Call für einen Batch aus – erst parsed, dann robustes Fallback.
     Gibt immer eine Liste von Objekten zurück (leer, wenn nichts geparst werden konnte).
@@ -156,10 +225,10 @@ def call_model_batch(batch_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]
 
     try:
         part = gemini.query_parsed(
-            task="json_extraction",
+            task=task,
             payload=batch_payload,
-            schema=schema,
-            example=example
+            schema=task_schema,
+            example=task_example
         )
         if isinstance(part, list):
             return part
@@ -174,10 +243,10 @@ def call_model_batch(batch_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]
     
     try:
         raw = gemini.query_build(
-            task="json_extraction",
+            task=task,
             payload=batch_payload,
-            schema=schema,
-            example=example
+            schema=task_schema,
+            example=task_example
         )
         if isinstance(raw, (list, dict)):
            
@@ -192,9 +261,588 @@ def call_model_batch(batch_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]
         return []
 
 
+def apply_local_gender(result: Dict[str, Any], gender: GenderResult | None,
+                       with_reason: bool = True) -> Dict[str, Any]:
+    """
+    Überträgt das lokal bestimmte Genus in ein Ergebnis des LLM.
+    Das LLM liefert gender_reason nur für die Felder, die es selbst bestimmt hat.
+    """
+    if gender is None or not gender.reason:
+        return result
+    if gender.german is not None:
+        result["gender_german"] = gender.german
+    if gender.russian is not None:
+        result["gender_russian"] = gender.russian
+    if not with_reason:
+        return result
+    llm_reason = result.get("gender_reason") if not gender.complete else None
+    result["gender_reason"] = f"{gender.reason} {llm_reason}" if llm_reason else gender.reason
+    return result
+
+
+def task_for(lean: bool = False) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Prompt-Task, Schema und Beispiel des Hauptlaufs."""
+    if lean:
+        return "json_extraction_lean", lean_schema, lean_example
+    return "json_extraction", schema, example
+
+
+def prepare_batch(batch_payload: List[Dict[str, Any]], local_gender: bool = True
+                  ) -> Tuple[List[Dict[str, Any]], List[GenderResult | None]]:
+    """
+    Gibt jedem Eintrag eine batch-lokale id (Position im Batch), die das LLM
+    unverändert zurückgibt. Mit local_gender wird das Genus über die lokalen
+    Regeln bestimmt und bekannte Felder werden in die Eingabe eingetragen.
+    Gibt die Eingabe für das LLM und die lokalen Ergebnisse je Position zurück.
+    """
+    genders: List[GenderResult | None] = [resolve_gender(row) if local_gender else None
+                                          for row in batch_payload]
+    prepared: List[Dict[str, Any]] = []
+    for i, (row, gender) in enumerate(zip(batch_payload, genders)):
+        item = {"id": i, **row}
+        # bereits bekannte Felder muss das LLM nicht mehr ausgeben
+        if gender is not None and gender.german is not None:
+            item["gender_german"] = gender.german
+        if gender is not None and gender.russian is not None:
+            item["gender_russian"] = gender.russian
+        prepared.append(item)
+    return prepared, genders
+
+
+@tracer.traced("call_model_batch")
+def call_model_batch(batch_payload: List[Dict[str, Any]], local_gender: bool = True,
+                     lean: bool = False) -> List[Dict[str, Any]]:
+    """
+    Führt den LLM-Call für einen Batch aus. Mit local_gender wird das Genus
+    vorher über die lokalen Regeln bestimmt und nur für unklare Fälle vom LLM erfragt.
+    Mit lean werden nur score und Genus ohne Begründungen angefragt.
+    Die Antworten behalten die batch-lokale id, das lokale Genus wird über
+    sie zugeordnet, auch wenn das LLM einen Namen verändert hat.
+    """
+    task, task_schema, task_example = task_for(lean)
+    prepared, genders = prepare_batch(batch_payload, local_gender)
+    results = _query_batch(prepared, task, task_schema, task_example)
+    if local_gender:
+        for result, gender in zip(match_results(prepared, results, record_key), genders):
+            if result is not None:
+                apply_local_gender(result, gender, with_reason=not lean)
+    return results
+
+
+@tracer.traced("call_reason_batch")
+def call_reason_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fragt reason (und falls nötig gender_reason) für bereits bewertete Einträge nach.
+    Lokal bestimmbare gender_reason werden ohne LLM ergänzt, aber nur wenn die
+    lokalen Regeln dasselbe Genus ergeben wie gender_german/gender_russian des
+    Eintrags. Die Antworten behalten die batch-lokale id der Eingabe.
+    """
+    prepared: List[Dict[str, Any]] = []
+    for i, r in enumerate(records):
+        item = {"id": i, **{k: r.get(k) for k in ("category", "latin", "german", "russian",
+                                                   "score", "gender_german", "gender_russian")}}
+        if not r.get("gender_reason"):
+            gender = resolve_gender(r)
+            stored = (_genus(r.get("gender_german")), _genus(r.get("gender_russian")))
+            if gender.complete and (gender.german, gender.russian) == stored:
+                r["gender_reason"] = gender.reason
+            else:
+                # die Regel begründet ein anderes Genus als gespeichert
+                item["needs_gender_reason"] = True
+        prepared.append(item)
+    return _query_batch(prepared, "reason_extraction", reason_schema, reason_example)
+
+
+def _genus(value: Any) -> str | None:
+    """gespeichertes Genus (M/F/N) vergleichbar machen."""
+    return value.strip().upper() if isinstance(value, str) and value.strip() else None
+
+
+def add_batch_estimate(estimate: Estimate, batch: List[Dict[str, Any]], local_gender: bool = True,
+                       lean: bool = False) -> None:
+    """
+    Rendert den Prompt eines Batches wie im echten Lauf, ohne ihn zu senden,
+    und zählt ihn als eine Anfrage in estimate.
+    """
+    task, task_schema, task_example = task_for(lean)
+    prepared, genders = prepare_batch(batch, local_gender)
+    prompt = gemini.render_prompt(task, payload=prepared, schema=task_schema, example=task_example)
+    if lean:
+        output_tokens = len(batch) * OUTPUT_TOKENS_PER_ROW_LEAN
+    else:
+        # lokal vollständig bestimmtes Genus spart gender_reason
+        local = sum(1 for g in genders if g is not None and g.complete)
+        output_tokens = len(batch) * OUTPUT_TOKENS_PER_ROW - local * GENDER_REASON_TOKENS
+    estimate.add_request(prompt, len(batch), output_tokens)
+
+
+def estimate_run(store: RecordStore, ids: Sequence[int], batch_size: int, local_gender: bool = True,
+                 lean: bool = False) -> Estimate:
+    """
+    Schätzt Tokens und Anfragen aller Batches, siehe add_batch_estimate.
+    Retry-Runden sind nicht enthalten.
+    """
+    estimate = Estimate()
+    for batch_ids in chunk(ids, batch_size):
+        add_batch_estimate(estimate, store.batch(batch_ids), local_gender, lean)
+    return estimate
+
+
+def process_rows(store: RecordStore, ids: Sequence[int], batch_size: int, max_retries: int,
+                 local_gender: bool = True, lean: bool = False,
+                 top: int | None = None, budget: Budget | None = None) -> List[int]:
+    """
+    Sendet die Zeilen ids des Stores in Batches an das LLM und fragt fehlende
+    Einträge in bis zu max_retries Runden erneut an. Die Ergebnisse landen
+    per Zeilen-ID in store.results, zurück kommen die IDs in Ausgabereihenfolge.
+    Jeder Batch wird lokal nach score sortiert, das Ergebnis ist der stabile
+    k-way merge dieser Läufe und damit global nach score sortiert.
+    Mit top werden nur die ersten top Einträge des Merges erzeugt.
+    Mit budget wird vor jedem Batch geprüft, ob Token-Budget und Deadline
+    noch reichen. Sonst endet der Lauf mit dem Teilergebnis, die offenen
+    Zeilen stehen danach in budget.pending.
+    """
+    def allowed(batch_ids: Sequence[int]) -> bool:
+        if budget is None:
+            return True
+        # vor der ersten Anfrage gibt es keinen Durchschnitt, der Batch wird geschätzt
+        first = None
+        if budget.requests == 0:
+            first = Estimate()
+            add_batch_estimate(first, store.batch(batch_ids), local_gender, lean)
+        return budget.allows_next(first)
+
+    run_start = perf_counter()
+    runs: List[List[int]] = []
+    for i, batch_ids in enumerate(chunk(ids, batch_size), start=1):
+        if not allowed(batch_ids):
+            print(f"Abbruch vor Batch {i}: {budget.stopped}", file=sys.stderr)
+            break
+        start = perf_counter()
+        with tracer.span("batch", index=i, rows=len(batch_ids)) as span:
+            part = call_model_batch(store.batch(batch_ids), local_gender, lean)
+            if not isinstance(part, list):
+                part = []
+            span["results"] = len(part)
+        if budget is not None:
+            budget.charge()
+        runs.append(store.add_run(batch_ids, part))
+        print(f"Batch {i}: {len(part)} Elemente ({perf_counter() - start:.1f} s)", file=sys.stderr)
+
+    expected = len(ids)
+    total = sum(len(run) for run in runs)
+    missing = [i for i in ids if i not in store.results]
+
+    retry_round = 0
+    while missing and retry_round < max_retries and (budget is None or budget.stopped is None):
+        retry_round += 1
+        print(f"Retry {retry_round}: {len(missing)} – erneut",
+              file=sys.stderr)
+        metrics.RETRY_ROUNDS.inc()
+        metrics.RETRY_ROWS.inc(len(missing))
+
+        with tracer.span("retry_round", round=retry_round, missing=len(missing)):
+            for batch_ids in chunk(missing, max(10, batch_size // 2)):  
+                if not allowed(batch_ids):
+                    print(f"Abbruch in Retry {retry_round}: {budget.stopped}", file=sys.stderr)
+                    break
+                part = call_model_batch(store.batch(batch_ids), local_gender, lean)
+                if budget is not None:
+                    budget.charge()
+                if isinstance(part, list):
+                    added = store.add_run(batch_ids, part)
+                    runs.append(added)
+                    total += len(added)
+
+            missing = [i for i in ids if i not in store.results]
+        print(f"Nach Retry {retry_round}: gesamt {total} / erwartet {expected}",
+              file=sys.stderr)
+
+    if budget is not None and budget.stopped is not None:
+        budget.pending = store.batch(missing)
+    with tracer.span("merge_runs", runs=len(runs), records=total):
+        ordered = list(islice(merge_sorted_runs(runs, store.score), top))
+    metrics.ROWS_DONE.inc(len(ordered))
+    elapsed = perf_counter() - run_start
+    metrics.ROWS_PER_SECOND.set(len(ordered) / elapsed if elapsed > 0 else 0.0)
+    return ordered
+
+
+def watch(args: argparse.Namespace) -> None:
+    """
+    Watch-Modus: hält den Gemini-Client warm, prüft die Eingabe-CSVs
+    regelmäßig (mtime + Hash) und verarbeitet nur neue oder geänderte Zeilen.
+    Die Ausgabedatei wird nach jeder Änderung ersetzt.
+    """
+    paths = [args.csv, args.csv2]
+    # Fingerprint vor dem ersten Einlesen, Änderungen während des ersten Laufs gehen nicht verloren
+    watcher = FileWatcher(paths)
+    rows_by_file = {path: extract_rows(path) for path in paths}
+    payload = [row for path in paths for row in rows_by_file[path]]
+    metrics.ROWS_INPUT.inc(len(payload))
+
+    # Warmstart: vorhandene Ergebnisse weiterverwenden
+    results: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    if args.output.exists():
+        try:
+            with args.output.open(encoding="utf-8") as f:
+                previous = json.load(f)
+            results = {record_key(r): r for r in previous if isinstance(r, dict)}
+        except Exception as e:
+            print(f"Vorheriges Ergebnis nicht lesbar, starte neu: {e}", file=sys.stderr)
+
+    def update(todo: List[Dict[str, Any]]) -> None:
+        current = {record_key(row) for row in payload}
+        for k in list(results):
+            if k not in current:
+                del results[k]
+        if todo:
+            metrics.CACHE_MISSES.inc(len(todo))
+            store = RecordStore()
+            store.extend(todo)
+            done = process_rows(store, range(len(store)), args.batch_size, args.max_retries,
+                                not args.no_local_gender, args.lean)
+            for r in store.result_dicts(done):
+                results[record_key(r)] = r
+        current_results = [results[k] for k in dict.fromkeys(record_key(row) for row in payload) if k in results]
+        if args.top_k is not None:
+            ordered = top_k(current_results, args.top_k)
+        else:
+            ordered = sorted(current_results, key=lambda r: -score_of(r))
+        write_json_stream(args.output, ordered)
+        print(f"Ergebnis aktualisiert: {len(current_results)} / {len(payload)} unter {args.output.resolve()}",
+              file=sys.stderr)
+        if args.metrics_file is not None:
+            metrics.registry.write(str(args.metrics_file))
+
+    todo = [row for row in payload if record_key(row) not in results]
+    metrics.CACHE_HITS.inc(len(payload) - len(todo))
+    update(todo)
+
+    print(f"Überwache {', '.join(str(p) for p in paths)} alle {args.watch_interval:g} s (Strg+C beendet)",
+          file=sys.stderr)
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            changed = watcher.changed()
+            if not changed:
+                continue
+            todo = []
+            for path in changed:
+                try:
+                    new_rows = extract_rows(path)
+                except Exception as e:
+                    print(f"Fehler beim Lesen von {path}: {e}", file=sys.stderr)
+                    continue
+                affected, removed = diff_rows(rows_by_file[path], new_rows, record_key)
+                rows_by_file[path] = new_rows
+                print(f"{path}: {len(affected)} neu/geändert, {len(removed)} entfernt", file=sys.stderr)
+                todo.extend(affected)
+            payload = [row for path in paths for row in rows_by_file[path]]
+            # geänderte Zeilen bekommen ein neues Ergebnis
+            for row in todo:
+                results.pop(record_key(row), None)
+            update(todo)
+    except KeyboardInterrupt:
+        print("Watch-Modus beendet", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    Führt den eigentlichen Lauf aus: CSV einlesen, Batches an das LLM senden,
+    fehlende Einträge erneut anfragen und das Ergebnis schreiben.
+    """
+    shard = None
+    if args.shard is not None:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.watch:
+            print("Fehler: --watch und --shard können nicht kombiniert werden", file=sys.stderr)
+            sys.exit(1)
+
+    limited = args.dry_run or args.budget_tokens is not None or args.deadline is not None or args.resume
+    if args.watch and limited:
+        print("Fehler: --watch kann nicht mit --dry-run, --budget-tokens, --deadline oder --resume kombiniert werden",
+              file=sys.stderr)
+        sys.exit(1)
+    # die Deadline zählt ab Start des Laufs, inklusive Einlesen
+    budget = None
+    if args.budget_tokens is not None or args.deadline is not None:
+        budget = Budget(args.budget_tokens, args.deadline, used_tokens=metrics.LLM_TOKENS.total)
+    # eine einzelne Anfrage endet spätestens an der Deadline
+    gemini.deadline = budget.deadline if budget is not None else None
+
+    # hedged requests gegen langsame Antworten
+    if args.hedge_percentile is not None:
+        try:
+            gemini.hedging = HedgingPolicy(percentile=args.hedge_percentile,
+                                           max_hedge_rate=args.hedge_max_rate)
+        except ValueError as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # Zeilen einmal im Store, Batches und Ausgabe arbeiten mit Zeilen-IDs
+    store = RecordStore()
+    # PDF direkt einlesen statt der CSV-Exporte
+    if args.pdf is not None:
+        if args.watch:
+            print("Fehler: --watch ist nur mit CSV-Eingabe möglich", file=sys.stderr)
+            sys.exit(1)
+        try:
+            count = store.extend(extract_pdf_rows(args.pdf, workers=args.pdf_workers))
+            print(f"PDF mit {count} Zeilen eingelesen.", file=sys.stderr)
+            metrics.ROWS_INPUT.inc(count)
+        except Exception as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+    elif args.json is not None:
+        if args.watch:
+            print("Fehler: --watch ist nur mit CSV-Eingabe möglich", file=sys.stderr)
+            sys.exit(1)
+        try:
+            # Extractor-Ergebnis wird gestreamt, nur der Store liegt im Speicher
+            with tracer.span("extract_json", file=str(args.json)):
+                count = store.extend(iter_json_rows(args.json))
+            print(f"JSON mit {count} Einträgen eingelesen.", file=sys.stderr)
+            metrics.ROWS_INPUT.inc(count)
+        except ExtractorResultError as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        # check files 
+        if not args.csv.exists():
+            print(f"Fehler: CSV nicht gefunden: {args.csv.resolve()}", file=sys.stderr)
+            sys.exit(1)
+        if not args.csv2.exists():
+            print(f"Fehler: CSV nicht gefunden: {args.csv2.resolve()}", file=sys.stderr)
+            sys.exit(1)
+
+        if args.watch:
+            watch(args)
+            return
+
+        # join csv files
+        try:
+            with tracer.span("extract_rows", file=str(args.csv)):
+                count1 = store.extend(iter_rows(args.csv))
+            print(f"Erste CSV mit {count1} Zeilen eingelesen.", file=sys.stderr)
+            with tracer.span("extract_rows", file=str(args.csv2)):
+                count2 = store.extend(iter_rows(args.csv2))
+            print(f"Zweite CSV mit {count2} Zeilen eingelesen.", file=sys.stderr)
+            print(f"Gesamt {count1 + count2} Zeilen ", file=sys.stderr)
+            metrics.ROWS_INPUT.inc(count1 + count2)
+        except Exception as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+
+    out_path = args.output
+    ids: Sequence[int] = range(len(store))
+    if shard is not None:
+        # jeder Shard verarbeitet nur seinen Teil, zusammenführen mit "merge"
+        ids = [row.id for row in select_shard(store.rows, shard[0], shard[1], lambda row: row.key)]
+        out_path = shard_output_path(args.output, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(ids)} Zeilen", file=sys.stderr)
+
+    # abgebrochenen Lauf fortsetzen: nur die offenen Zeilen, Teilergebnis behalten
+    checkpoint = checkpoint_path(out_path)
+    previous: List[int] = []
+    if args.resume and not checkpoint.exists():
+        # ohne Checkpoint würde alles neu angefragt und das Teilergebnis überschrieben
+        print(f"Fehler: kein Checkpoint zum Fortsetzen gefunden: {checkpoint.resolve()}", file=sys.stderr)
+        sys.exit(1)
+    if args.resume:
+        try:
+            ids = [store.add(row) for row in load_run(checkpoint)]
+            if out_path.exists():
+                # schon nach score sortiert
+                previous = [i for i in map(store.set_result, load_run(out_path)) if i is not None]
+        except Exception as e:
+            print(f"Fehler : {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Fortsetzung: {len(ids)} offene Zeilen, {len(previous)} vorhandene Ergebnisse",
+              file=sys.stderr)
+
+    if args.dry_run:
+        dry_run(store, ids, args)
+        return
+
+    # Ergebnis ist global nach score sortiert, Shards lassen sich per k-way merge zusammenführen
+    ordered = process_rows(store, ids, args.batch_size, args.max_retries,
+                           not args.no_local_gender, args.lean, args.top_k, budget)
+    if previous:
+        ordered = list(islice(merge_sorted_runs([previous, ordered], store.score), args.top_k))
+    if gemini.hedging is not None:
+        print(f"Hedging: {gemini.hedging.stats()}", file=sys.stderr)
+    # write to file
+    try:
+        write_json_stream(out_path, store.result_dicts(ordered))
+        print(f"Ergebnis unter: {out_path.resolve()}", file=sys.stderr)
+        if budget is not None and budget.stopped is not None:
+            # offene Zeilen sichern, weiter mit --resume
+            write_json_stream(checkpoint, budget.pending)
+            print(f"{budget.stopped}: Teilergebnis gespeichert, {len(budget.pending)} offene Zeilen unter "
+                  f"{checkpoint.resolve()} (fortsetzen mit --resume)", file=sys.stderr)
+        elif checkpoint.exists():
+            checkpoint.unlink()
+    except Exception as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.print_json:
+    
+        print(json.dumps(list(store.result_dicts(ordered)), ensure_ascii=False, indent=2))
+
+
+def dry_run(store: RecordStore, ids: Sequence[int], args: argparse.Namespace) -> None:
+    """
+    Probelauf ohne LLM-Aufrufe: rendert alle Batch-Prompts und gibt die
+    geschätzten Tokens, Kosten und die Laufzeit aus.
+    """
+    estimate = estimate_run(store, ids, args.batch_size, not args.no_local_gender, args.lean)
+    cost = estimate.cost(args.price_input, args.price_output)
+    print(f"Probelauf: {estimate.rows} Zeilen in {estimate.requests} Anfragen (ohne Retry-Runden)",
+          file=sys.stderr)
+    print(f"Tokens geschätzt: {estimate.input_tokens} Eingabe, {estimate.output_tokens} Ausgabe",
+          file=sys.stderr)
+    print(f"Kosten geschätzt: {cost:.4f} USD "
+          f"({args.price_input:g} / {args.price_output:g} USD pro 1M Tokens)", file=sys.stderr)
+    print(f"Laufzeit geschätzt: {estimate.seconds():.0f} s", file=sys.stderr)
+    total = estimate.input_tokens + estimate.output_tokens
+    if args.budget_tokens is not None and total > args.budget_tokens:
+        print(f"Warnung: Schätzung {total} Tokens über --budget-tokens {args.budget_tokens}", file=sys.stderr)
+    if args.deadline is not None and estimate.seconds() > args.deadline:
+        print(f"Warnung: Schätzung {estimate.seconds():.0f} s über --deadline {args.deadline:g} s", file=sys.stderr)
+
+
+def serve(argv: List[str]) -> None:
+    """
+    Lokaler HTTP-Dienst zur Anreicherung einzelner Tiere (POST /enrich).
+    Anfragen werden kurz gesammelt und gemeinsam an das LLM gesendet.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m updater.updater serve",
+        description="Lokaler HTTP-Dienst: einzelne Tiere oder kleine Listen anreichern"
+    )
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Bind-Adresse (Standard: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8765,
+                        help="Port (Standard: 8765)")
+    parser.add_argument("--window", type=float, default=0.05,
+                        help="Sammelfenster in Sekunden, bevor ein Batch gesendet wird (Standard: 0.05)")
+    parser.add_argument("--batch-size", "-b", type=int, default=20,
+                        help="Maximale Anzahl Einträge pro LLM-Call (Standard: 20)")
+    parser.add_argument("--max-records", type=int, default=50,
+                        help="Maximale Anzahl Einträge pro HTTP-Anfrage (Standard: 50)")
+    args = parser.parse_args(argv)
+
+    batcher = MicroBatcher(call_model_batch, record_key, window=args.window, max_batch=args.batch_size)
+    server = create_server(batcher, host=args.host, port=args.port, max_records=args.max_records)
+    print(f"Dienst läuft unter http://{args.host}:{args.port}/enrich (Strg+C beendet)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Dienst beendet", file=sys.stderr)
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+def reasons(argv: List[str]) -> None:
+    """
+    Lädt Begründungen (reason, gender_reason) für ein mit --lean erzeugtes
+    Ergebnis nach, nur für die Einträge, die sie brauchen (z.B. Top-N nach score).
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m updater.updater reasons",
+        description="Begründungen für bereits bewertete Einträge nachladen"
+    )
+    parser.add_argument("--input", "-i", type=Path, default=Path("gemini_output.json"),
+                        help='Ergebnisdatei, wird aktualisiert (Standard: "gemini_output.json")')
+    parser.add_argument("--top", "-n", type=int, default=None,
+                        help="Nur die N Einträge mit dem höchsten score (Standard: alle)")
+    parser.add_argument("--batch-size", "-b", type=int, default=10,
+                        help="Anzahl der Einträge pro LLM-Call (Standard: 10)")
+    args = parser.parse_args(argv)
+
+    try:
+        with args.input.open(encoding="utf-8") as f:
+            results = json.load(f)
+        if not isinstance(results, list):
+            raise ValueError("Ergebnisdatei muss eine JSON-Liste enthalten")
+    except Exception as e:
+        print(f"Fehler : {e}", file=sys.stderr)
+        sys.exit(1)
+
+    records = [r for r in results if isinstance(r, dict)]
+    if args.top is not None:
+        records = top_k(records, args.top)
+    todo = [r for r in records if not r.get("reason")]
+    print(f"{len(todo)} von {len(records)} Einträgen ohne Begründung", file=sys.stderr)
+
+    for i, batch in enumerate(chunk(todo, args.batch_size), start=1):
+        part = call_reason_batch(batch)
+        got = 0
+        # Zuordnung über die batch-lokale id, das LLM kann Namen verändern
+        for target, r in zip(batch, match_results(batch, part, record_key)):
+            if r is None:
+                continue
+            for field in ("reason", "gender_reason"):
+                if r.get(field) and not target.get(field):
+                    target[field] = r[field]
+            got += 1
+        print(f"Batch {i}: {got} / {len(batch)} Begründungen", file=sys.stderr)
+        # nach jedem Batch sichern, ein Abbruch verliert nichts
+        write_json_stream(args.input, results)
+    print(f"Ergebnis unter: {args.input.resolve()}", file=sys.stderr)
+
+
+def merge(argv: List[str]) -> None:
+    """
+    Führt die Ausgaben der Shards (--shard i/N) per k-way merge zu einer
+    nach score sortierten Datei zusammen. Bei doppelten Einträgen gewinnt
+    der höhere score, bei gleichem score der Shard, der zuerst angegeben ist.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m updater.updater merge",
+        description="Shard-Ausgaben zu einer nach score sortierten Datei zusammenführen"
+    )
+    parser.add_argument("inputs", type=Path, nargs="+",
+                        help="Ausgabedateien der Shards, z.B. gemini_output.shard-*-of-4.json")
+    parser.add_argument("--output", "-o", type=Path, default=Path("gemini_output.json"),
+                        help='Zieldatei (Standard: "gemini_output.json")')
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Nur die k Einträge mit dem höchsten score schreiben")
+    args = parser.parse_args(argv)
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k muss mindestens 1 sein")
+
+    try:
+        runs = [load_run(path) for path in args.inputs]
+    except Exception as e:
+        print(f"Fehler : {e}", file=sys.stderr)
+        sys.exit(1)
+    total = sum(len(run) for run in runs)
+    merged = unique_by_key(merge_sorted_runs(runs), record_key)
+    count = write_json_stream(args.output, islice(merged, args.top_k))
+    print(f"{len(runs)} Shards, {total} Einträge, {count} geschrieben", file=sys.stderr)
+    print(f"Ergebnis unter: {args.output.resolve()}", file=sys.stderr)
 
 
 def main():
+    # Unterbefehle
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "reasons":
+        reasons(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        merge(sys.argv[2:])
+        return
+
     # Standard-Dateien: beide Tabellen
     DEFAULT_CSV_1 = Path("Neue DatenbankCSV.csv")
     DEFAULT_CSV_2 = Path("Neue DatenbankCSV1.csv")
@@ -206,6 +854,12 @@ def main():
                         help=f'Pfad zur ersten Eingabe-CSV (Standard: "{DEFAULT_CSV_1}")')
     parser.add_argument("--csv2", "-c2", type=Path, default=DEFAULT_CSV_2,
                         help=f'Pfad zur zweiten Eingabe-CSV (Standard: "{DEFAULT_CSV_2}")')
+    parser.add_argument("--pdf", type=Path, default=None,
+                        help='Tabelle direkt aus der PDF-Datenbank lesen statt aus den CSVs (z.B. "Neue Datenbank.pdf")')
+    parser.add_argument("--json", type=Path, default=None,
+                        help="Einträge aus einem Extractor-Ergebnis (JSON-Liste mit category, latin, german, russian) lesen")
+    parser.add_argument("--pdf-workers", type=int, default=None,
+                        help="Anzahl Prozesse für das parallele Lesen der PDF-Seiten (Standard: Anzahl CPUs)")
     parser.add_argument("--batch-size", "-b", type=int, default=20,
                         help="Anzahl der Einträge pro LLM-Call (Standard: 20)")
 
@@ -213,74 +867,78 @@ def main():
                         help="Anzahl der Retry-Runden bei fehlenden Einträgen (Standard: 1)")
     parser.add_argument("--print-json", action="store_true",
                         help="Gesamtergebnis zusätzlich auf STDOUT ausgeben")
+    parser.add_argument("--no-local-gender", action="store_true",
+                        help="Genus nicht lokal bestimmen, sondern für alle Einträge vom LLM erfragen")
+    parser.add_argument("--lean", action="store_true",
+                        help="Nur score und Genus anfragen, Begründungen später mit dem Unterbefehl reasons")
+    parser.add_argument("--output", "-o", type=Path, default=Path("gemini_output.json"),
+                        help='Pfad der Ausgabedatei (Standard: "gemini_output.json")')
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Nur die k Einträge mit dem höchsten score schreiben")
+    parser.add_argument("--shard", default=None,
+                        help="Nur den Shard i von N verarbeiten, z.B. 0/4 (stabile Aufteilung nach record_key)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Nichts senden: Prompts rendern, Tokens, Kosten und Laufzeit schätzen")
+    parser.add_argument("--price-input", type=float, default=PRICE_INPUT_PER_M,
+                        help=f"Preis in USD pro 1M Eingabe-Tokens für --dry-run (Standard: {PRICE_INPUT_PER_M:g})")
+    parser.add_argument("--price-output", type=float, default=PRICE_OUTPUT_PER_M,
+                        help=f"Preis in USD pro 1M Ausgabe-Tokens für --dry-run (Standard: {PRICE_OUTPUT_PER_M:g})")
+    parser.add_argument("--budget-tokens", type=int, default=None,
+                        help="Höchstens so viele Tokens verbrauchen, danach Teilergebnis und offene Zeilen sichern")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Höchstens so viele Sekunden laufen, danach Teilergebnis und offene Zeilen sichern")
+    parser.add_argument("--resume", action="store_true",
+                        help="Abgebrochenen Lauf mit den offenen Zeilen aus <output>.pending.json fortsetzen")
+    parser.add_argument("--watch", action="store_true",
+                        help="Eingabe-CSVs überwachen und nur geänderte Zeilen neu verarbeiten")
+    parser.add_argument("--watch-interval", type=float, default=2.0,
+                        help="Abfrageintervall des Watch-Modus in Sekunden (Standard: 2)")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Latenz-Perzentil, ab dem eine doppelte Anfrage gesendet wird, z.B. 95 (Standard: aus)")
+    parser.add_argument("--hedge-max-rate", type=float, default=0.1,
+                        help="Maximaler Anteil doppelter Anfragen (Standard: 0.1)")
+    parser.add_argument("--trace", type=Path, default=None,
+                        help="Spans der einzelnen Stufen im Chrome-Trace-Format in diese Datei schreiben")
+    parser.add_argument("--profile", type=Path, nargs="?", const=Path("updater.prof"), default=None,
+                        help="Lauf mit cProfile messen und Statistik schreiben (Standard: updater.prof)")
+    parser.add_argument("--metrics-file", type=Path, default=None,
+                        help="Metriken im Prometheus-Textformat in diese Datei schreiben (z.B. updater.prom)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Metriken lokal unter http://127.0.0.1:<port>/metrics bereitstellen")
     args = parser.parse_args()
-
-    # check files 
-    if not args.csv.exists():
-        print(f"Fehler: CSV nicht gefunden: {args.csv.resolve()}", file=sys.stderr)
-        sys.exit(1)
-    if not args.csv2.exists():
-        print(f"Fehler: CSV nicht gefunden: {args.csv2.resolve()}", file=sys.stderr)
-        sys.exit(1)
-
-    # join csv files
+    if args.pdf is not None and args.json is not None:
+        parser.error("--pdf und --json können nicht kombiniert werden")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k muss mindestens 1 sein")
+    if args.budget_tokens is not None and args.budget_tokens < 1:
+        parser.error("--budget-tokens muss mindestens 1 sein")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline muss größer als 0 sein")
+
+    if args.metrics_port is not None:
+        metrics.registry.serve(args.metrics_port)
+        print(f"Metriken unter: http://127.0.0.1:{args.metrics_port}/metrics", file=sys.stderr)
+
+    if args.trace is not None:
+        tracer.enable()
+    profiler = cProfile.Profile() if args.profile is not None else None
+    if profiler is not None:
+        profiler.enable()
     try:
-        payload1 = extract_rows(args.csv)
-        print(f"Erste CSV mit {len(payload1)} Zeilen eingelesen.", file=sys.stderr)
-        payload2 = extract_rows(args.csv2)
-        print(f"Zweite CSV mit {len(payload2)} Zeilen eingelesen.", file=sys.stderr)
-        payload = payload1 + payload2
-        print(f"Gesamt {len(payload)} Zeilen ", file=sys.stderr)
-    except Exception as e:
-        print(f"Fehler : {e}", file=sys.stderr)
-        sys.exit(1)
-        
-    all_results: List[Dict[str, Any]] = []
-    for i, batch in enumerate(chunk(payload, args.batch_size), start=1):
-        part = call_model_batch(batch)
-        if not isinstance(part, list):
-            part = []
-        all_results.extend(part)
-        print(f"Batch {i}: {len(part)} Elemente", file=sys.stderr)
-
-    expected = len(payload)
-    got_keys = {record_key(r) for r in all_results if isinstance(r, dict)}
-    missing = [row for row in payload if record_key(row) not in got_keys]
-
-    retry_round = 0
-    while missing and retry_round < args.max_retries:
-        retry_round += 1
-        print(f"Retry {retry_round}: {len(missing)} – erneut",
-              file=sys.stderr)
-
-        new_results: List[Dict[str, Any]] = []
-        for batch in chunk(missing, max(10, args.batch_size // 2)):  
-            part = call_model_batch(batch)
-            if isinstance(part, list):
-                new_results.extend(part)
-
-        for r in new_results:
-            k = record_key(r) if isinstance(r, dict) else ("", "", "")
-            if k and k not in got_keys:
-                got_keys.add(k)
-                all_results.append(r)
-
-        missing = [row for row in payload if record_key(row) not in got_keys]
-        print(f"Nach Retry {retry_round}: gesamt {len(all_results)} / erwartet {expected}",
-              file=sys.stderr)
-    # write to file
-    out_path = Path("gemini_output.json")
-    try:
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(all_results, f, ensure_ascii=False, indent=2)
-        print(f"Ergebnis unter: {out_path.resolve()}", file=sys.stderr)
-    except Exception as e:
-        print(f"Fehler: {e}", file=sys.stderr)
-        sys.exit(1)
-
-    if args.print_json:
-    
-        print(json.dumps(all_results, ensure_ascii=False, indent=2))
+        run(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(str(args.profile))
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+            print(f"Profil unter: {args.profile.resolve()}", file=sys.stderr)
+        if args.trace is not None:
+            tracer.export(str(args.trace))
+            print(f"Trace unter: {args.trace.resolve()}", file=sys.stderr)
+        if args.metrics_file is not None:
+            metrics.registry.write(str(args.metrics_file))
+            print(f"Metriken unter: {args.metrics_file.resolve()}", file=sys.stderr)
+        print(metrics.summary(), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional
+
+# rough size of a Gemini token, cyrillic text needs a few more tokens
+CHARS_PER_TOKEN = 4.0
+
+# answer size per record, measured on gemini_output.json
+# (full record with reason and gender_reason about 600 characters)
+OUTPUT_TOKENS_PER_ROW = 150
+OUTPUT_TOKENS_PER_ROW_LEAN = 40
+# a locally resolved genus saves the gender_reason sentence
+GENDER_REASON_TOKENS = 30
+
+# gemini-2.0-flash list prices in USD per 1M tokens
+PRICE_INPUT_PER_M = 0.10
+PRICE_OUTPUT_PER_M = 0.40
+
+# latency model for the projection: fixed overhead plus generation speed
+REQUEST_OVERHEAD_SECONDS = 1.5
+OUTPUT_TOKENS_PER_SECOND = 150.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Args: text: prompt or answer
+    Return: estimated number of tokens
+    """
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+@dataclass
+class Estimate:
+    """
+    projection of a run, see --dry-run
+    """
+    requests: int = 0
+    rows: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    def add_request(self, prompt: str, rows: int, output_tokens: int) -> None:
+        """
+        Args: prompt: rendered prompt of one batch
+              rows: number of records in the batch
+              output_tokens: estimated answer size
+        """
+        self.requests += 1
+        self.rows += rows
+        self.input_tokens += estimate_tokens(prompt)
+        self.output_tokens += output_tokens
+
+    def cost(self, price_input: float = PRICE_INPUT_PER_M, price_output: float = PRICE_OUTPUT_PER_M) -> float:
+        """
+        Args: price_input: USD per 1M input tokens
+              price_output: USD per 1M output tokens
+        Return: projected cost in USD
+        """
+        return self.input_tokens / 1e6 * price_input + self.output_tokens / 1e6 * price_output
+
+    def seconds(self) -> float:
+        """
+        Return: projected wall time of sequential requests in seconds
+        """
+        return self.requests * REQUEST_OVERHEAD_SECONDS + self.output_tokens / OUTPUT_TOKENS_PER_SECOND
+
+
+class Budget:
+    """
+    hard limits for a run, checked by the batch scheduler before every request
+
+    the next batch is only started if the average cost of the batches so far
+    still fits into the remaining tokens and time, the first batch is checked
+    against its estimate. a single request is cut off at the deadline by the
+    http timeout of the client
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, deadline_seconds: Optional[float] = None,
+                 used_tokens: Callable[[], float] = lambda: 0.0) -> None:
+        """
+        Args: max_tokens: maximum number of input + output tokens, None for no limit
+              deadline_seconds: maximum run time in seconds from now, None for no limit
+              used_tokens: function returning the tokens used so far, for example from the metrics
+        """
+        self.max_tokens = max_tokens
+        self.deadline = monotonic() + deadline_seconds if deadline_seconds is not None else None
+        self._used_tokens = used_tokens
+        self._start_tokens = used_tokens()
+        self._start = monotonic()
+        self.requests = 0
+        self.stopped: Optional[str] = None
+        # rows without result after a stop, written to the checkpoint
+        self.pending: List[Dict[str, Any]] = []
+
+    @property
+    def used(self) -> float:
+        return self._used_tokens() - self._start_tokens
+
+    def charge(self) -> None:
+        """
+        count a finished request for the average cost per request
+        """
+        self.requests += 1
+
+    def allows_next(self, first: Optional[Estimate] = None) -> bool:
+        """
+        check the limits before the next request, sets stopped with the reason.
+        before the first request there is no average, the estimate of the
+        first batch is used instead
+        Args: first: estimate of the next batch, only used before the first request
+        Return: true if the next request may be sent
+        """
+        if self.stopped is not None:
+            return False
+        now = monotonic()
+        if self.requests:
+            next_tokens = self.used / self.requests
+            next_seconds = (now - self._start) / self.requests
+        elif first is not None:
+            next_tokens = float(first.input_tokens + first.output_tokens)
+            next_seconds = first.seconds()
+        else:
+            next_tokens = next_seconds = 0.0
+        if self.max_tokens is not None and (self.used >= self.max_tokens
+                                            or self.used + next_tokens > self.max_tokens):
+            self.stopped = f"Token-Budget erreicht ({self.used:.0f} von {self.max_tokens})"
+        elif self.deadline is not None and (now >= self.deadline or now + next_seconds > self.deadline):
+            self.stopped = "Deadline erreicht"
+        return self.stopped is None
+
+def checkpoint_path(output: Path) -> Path:
+    """
+    Args: output: output file of the run, for example gemini_output.json
+    Return: file with the open rows of a stopped run, gemini_output.pending.json
+    """
+    return output.with_name(f"{output.stem}.pending{output.suffix or '.json'}")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, TextIO, Union
+
+
+@contextmanager
+def atomic_write(path: Union[str, Path]) -> Iterator[TextIO]:
+    """
+    write a text file next to path and move it over path at the end,
+    readers never see half a file. on an error the old file is kept
+    Args: path: output file
+    Return: context manager with the open temporary file
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, NamedTuple, Optional
+
+# head nouns of german animal names, compounds are matched by their last part
+# ("Klammeraffe" -> "affe"), the longest match wins
+GERMAN_LEXICON: Dict[str, str] = {
+    # maskulin
+    "affe": "M", "schimpanse": "M", "gorilla": "M", "utan": "M", "pavian": "M",
+    "mandrill": "M", "drill": "M", "makak": "M", "lemur": "M", "vari": "M",
+    "gibbon": "M", "siamang": "M", "kapuziner": "M", "tamarin": "M", "löwe": "M",
+    "tiger": "M", "leopard": "M", "gepard": "M", "jaguar": "M", "puma": "M",
+    "luchs": "M", "bär": "M", "wolf": "M", "fuchs": "M", "hund": "M", "marder": "M",
+    "dachs": "M", "elefant": "M", "hirsch": "M", "elch": "M",
+    "esel": "M", "büffel": "M", "bison": "M", "wisent": "M", "tapir": "M",
+    "hase": "M", "igel": "M", "biber": "M", "wal": "M", "delfin": "M",
+    "seehund": "M", "vogel": "M", "adler": "M", "falke": "M", "geier": "M",
+    "uhu": "M", "kauz": "M", "storch": "M", "ibis": "M", "reiher": "M",
+    "kranich": "M", "schwan": "M", "papagei": "M", "sittich": "M", "kakadu": "M",
+    "pelikan": "M", "pinguin": "M", "flamingo": "M", "fasan": "M", "strauß": "M",
+    "specht": "M", "rabe": "M", "säger": "M", "hahn": "M", "kolibri": "M",
+    "tukan": "M", "kiwi": "M", "emu": "M", "nandu": "M", "kasuar": "M",
+    "marabu": "M", "kormoran": "M", "waldrapp": "M", "frosch": "M", "molch": "M",
+    "salamander": "M", "python": "M", "waran": "M", "leguan": "M", "gecko": "M",
+    "skink": "M", "alligator": "M", "kaiman": "M", "fisch": "M", "hai": "M",
+    "käfer": "M", "schmetterling": "M", "fink": "M", "sperling": "M",
+    # feminin
+    "katze": "F", "gans": "F", "ente": "F", "taube": "F", "eule": "F",
+    "möwe": "F", "schlange": "F", "natter": "F", "viper": "F",
+    "kobra": "F", "boa": "F", "anakonda": "F", "mamba": "F", "kröte": "F",
+    "unke": "F", "echse": "F", "maus": "F", "ratte": "F", "giraffe": "F",
+    "antilope": "F", "gazelle": "F", "ziege": "F", "kuh": "F", "robbe": "F",
+    "hyäne": "F", "mangabe": "F", "spinne": "F", "biene": "F", "ameise": "F",
+    "wachtel": "F", "amsel": "F", "drossel": "F", "lerche": "F", "meise": "F",
+    "elster": "F", "krähe": "F", "dohle": "F", "trappe": "F", "ralle": "F",
+    "schwalbe": "F", "schnepfe": "F", "fledermaus": "F", "pute": "F",
+    "henne": "F", "stute": "F", "sau": "F",
+    # neutrum
+    "tier": "N", "pferd": "N", "rind": "N", "schwein": "N", "schaf": "N",
+    "huhn": "N", "reh": "N", "zebra": "N", "okapi": "N", "gnu": "N",
+    "känguru": "N", "nashorn": "N", "krokodil": "N", "chamäleon": "N",
+    "kamel": "N", "lama": "N", "alpaka": "N", "wiesel": "N", "opossum": "N",
+    "dromedar": "N", "wildschwein": "N", "perlhuhn": "N",
+}
+
+# suffixes with a fixed genus
+GERMAN_SUFFIXES = (
+    ("chen", "N"), ("lein", "N"),
+    ("ung", "F"), ("heit", "F"), ("keit", "F"), ("schaft", "F"),
+    # only the latin -tion/-sion, "Skorpion" is masculine
+    ("tion", "F"), ("sion", "F"),
+    ("ling", "M"), ("ismus", "M"),
+)
+
+# russian nouns whose genus does not follow from the ending
+RUSSIAN_EXCEPTIONS: Dict[str, Optional[str]] = {
+    # -ь
+    "медведь": "M", "лебедь": "M", "лось": "M", "гусь": "M", "олень": "M",
+    "тюлень": "M", "гоголь": "M", "журавль": "M", "голубь": "M", "соболь": "M",
+    "зверь": "M", "конь": "M", "окунь": "M", "пескарь": "M", "глухарь": "M",
+    "снегирь": "M", "рысь": "F", "мышь": "F", "лошадь": "F", "выпь": "F",
+    "шилохвость": "F", "сельдь": "F", "форель": "F", "моль": "F", "вошь": "F",
+    # unveränderliche Lehnwörter
+    "шимпанзе": "M", "кенгуру": "M", "какаду": "M", "фламинго": "M",
+    "колибри": "M", "пони": "M", "гну": "M", "зебу": "M", "киви": "M",
+    "эму": "M", "нанду": "M", "марабу": "M", "агути": "M", "коати": "M",
+    "коала": None,
+    # maskulin trotz -а
+    "ара": "M",
+}
+
+_ADJECTIVE_ENDINGS = ("ый", "ий", "ой", "ая", "яя", "ое", "ее", "ья", "ье", "ьи", "ые", "ие")
+_WORD = re.compile(r"[A-Za-zÄÖÜäöüßЀ-ӿ-]+")
+
+
+class GenderResult(NamedTuple):
+    """
+    locally resolved genus of one record, None where the rules are not sure
+    """
+    german: Optional[str]
+    russian: Optional[str]
+    reason: str
+
+    @property
+    def complete(self) -> bool:
+        return self.german is not None and self.russian is not None
+
+
+def german_head(name: str) -> str:
+    """
+    head noun of a german animal name: last word, last part of a hyphen compound
+    Args: name: german name, for example "Westlicher Flachlandgorilla"
+    Return: lower case head noun, empty string if none
+    """
+    # alternatives like "Kreuzotter/Viper" are left to the LLM
+    if "/" in (name or ""):
+        return ""
+    words = _WORD.findall(name or "")
+    if not words:
+        return ""
+    return words[-1].split("-")[-1].lower() or words[-1].lower()
+
+
+def resolve_german(name: str) -> Optional[tuple[str, str]]:
+    """
+    Args: name: german animal name
+    Return: (genus M/F/N, rule) or None if ambiguous
+    """
+    head = german_head(name)
+    if not head:
+        return None
+    best = max((w for w in GERMAN_LEXICON if head.endswith(w)), key=len, default=None)
+    if best is not None:
+        return GERMAN_LEXICON[best], f"'{best.capitalize()}'"
+    for suffix, genus in GERMAN_SUFFIXES:
+        if head.endswith(suffix):
+            return genus, f"Endung '-{suffix}'"
+    return None
+
+
+def russian_head(name: str) -> str:
+    """
+    head noun of a russian animal name: first word that is no adjective
+    ("Чёрно-белая кобра" -> "кобра"), of a hyphen compound noun the first
+    part ("Чирок-клоктун" -> "чирок")
+    Args: name: russian name, for example "Голуболицая мартышка"
+    Return: lower case head noun, empty string if none
+    """
+    # alternatives like "Песец/полярная лисица" are left to the LLM
+    if "/" in (name or ""):
+        return ""
+    words = [w.strip("-") for w in _WORD.findall(name or "")]
+    nouns = [w for w in words if w and not w.lower().endswith(_ADJECTIVE_ENDINGS)]
+    if not nouns:
+        return ""
+    # a second lower case noun ("Вара попугай") makes the head unclear,
+    # capitalised genitives of names ("Агути Азары") do not
+    if any(w[0].islower() for w in nouns[1:]):
+        return ""
+    return nouns[0].split("-")[0].lower()
+
+
+def resolve_russian(name: str) -> Optional[tuple[str, str]]:
+    """
+    Args: name: russian animal name
+    Return: (genus M/F, rule) or None if ambiguous
+    """
+    head = russian_head(name)
+    if not head:
+        return None
+    if head in RUSSIAN_EXCEPTIONS:
+        genus = RUSSIAN_EXCEPTIONS[head]
+        return (genus, f"'{head}' (Ausnahme)") if genus else None
+    if head.endswith(("а", "я")):
+        return "F", f"'{head}' endet auf -а/-я"
+    if head.endswith("ь"):
+        # -ь nouns are masculine or feminine, only the exception table knows
+        return None
+    if head.endswith(("и", "ы")):
+        # mostly plurals ("лягушки"), loanwords like "колибри" are in the exception table
+        return None
+    if head.endswith(("о", "е", "у", "ю", "э")):
+        # indeclinable loanwords for animals are masculine
+        return "M", f"'{head}' ist ein unveränderliches Lehnwort"
+    return "M", f"'{head}' endet auf Konsonant"
+
+
+def resolve_gender(row: Dict[str, Any]) -> GenderResult:
+    """
+    resolve the genus of a record with the local rules
+    Args: row: record with german and russian name
+    Return: GenderResult, fields are None where the LLM has to decide
+    """
+    german = resolve_german(row.get("german") or "")
+    russian = resolve_russian(row.get("russian") or "")
+    reasons = []
+    if german:
+        reasons.append(f"Deutsch {german[0]}: {german[1]}")
+    if russian:
+        reasons.append(f"Russisch {russian[0]}: {russian[1]}")
+    reason = ("Genusregel (lokal): " + "; ".join(reasons) + ".") if reasons else ""
+    return GenderResult(german[0] if german else None, russian[0] if russian else None, reason)
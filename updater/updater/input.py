@@ -1,4 +1,21 @@
+import codecs
 import json
+import mmap
+import re
+from typing import Any, BinaryIO, Iterator, Union
+
+# chunk size of the streaming reader
+CHUNK_SIZE = 1 << 20
+
+_TEXT_WHITESPACE = re.compile(r"[ \t\r\n]*")
+# rest of a window without a delimiter, an item cut off inside a literal or number
+_TOKEN_TAIL = re.compile(r"[^ \t\r\n,\]}]*")
+
+
+class ExtractorResultError(ValueError):
+    """
+    raised if an ExtractorResult file can not be read or is not valid JSON
+    """
 
 
 def load_extractor_result(file_path):
@@ -11,16 +28,168 @@ def load_extractor_result(file_path):
     Returns:
         dict: The parsed ExtractorResult as a Python dictionary.
 
-    Exits:
-        Exits the program with code 1 if the file is not found
-        or the JSON is invalid.
+    Raises:
+        ExtractorResultError: if the file is not found,
+        can not be read or the JSON is invalid.
     """
     try:
-        with open(file_path, "r") as f:
+        with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
-        exit(1)
-    except json.JSONDecodeError as e:
-        print(f"Error reading JSON: {e}")
-        exit(1)
+    except FileNotFoundError as e:
+        raise ExtractorResultError(f"File '{file_path}' not found.") from e
+    except OSError as e:
+        raise ExtractorResultError(f"File '{file_path}' can not be read: {e}") from e
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ExtractorResultError(f"Error reading JSON in '{file_path}': {e}") from e
+
+
+def _decode_items(f: Union[BinaryIO, mmap.mmap], chunk_size: int) -> Iterator[Any]:
+    """
+    Parse the items of a top level JSON array with json.JSONDecoder.raw_decode
+    on a window of the decoded file. Finding the end of an item and parsing
+    it is one pass in C, only the window is kept in memory.
+
+    Args:
+        f: file opened in binary mode or a memory map.
+        chunk_size: read size in bytes.
+
+    Returns:
+        iterator over the parsed items.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    text = ""
+    pos = 0
+    consumed = 0         # characters already dropped from text
+    eof = False
+
+    def more() -> bool:
+        # grows with the current item, huge items are not parsed again per chunk
+        nonlocal text, pos, consumed, eof
+        if eof:
+            return False
+        try:
+            block = f.read(max(chunk_size, len(text) - pos))
+        except OSError as e:
+            raise ExtractorResultError(f"File can not be read: {e}") from e
+        eof = not block
+        try:
+            text = text[pos:] + utf8.decode(block, final=eof)
+        except UnicodeDecodeError as e:
+            raise ExtractorResultError(f"File is not UTF-8: {e}") from e
+        consumed += pos
+        pos = 0
+        return True
+
+    def skip_whitespace() -> bool:
+        nonlocal pos
+        while True:
+            pos = _TEXT_WHITESPACE.match(text, pos).end()
+            if pos < len(text):
+                return True
+            if not more():
+                return False
+
+    if not skip_whitespace():
+        raise ExtractorResultError("Empty JSON document.")
+    if text[pos] == "{":
+        # a single object is one item
+        while more():
+            pass
+        try:
+            yield json.loads(text[pos:])
+        except ValueError as e:
+            raise ExtractorResultError(f"Error reading JSON: {e}") from e
+        return
+    if text[pos] != "[":
+        raise ExtractorResultError("Expected a JSON array or object at the top level.")
+    pos += 1
+
+    count = 0
+    while True:
+        if not skip_whitespace():
+            raise ExtractorResultError(f"Unexpected end of JSON document at character {consumed + pos}.")
+        if text[pos] == "]" and count == 0:
+            return
+        try:
+            item, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            # only an item cut off by the end of the window is read further,
+            # any other error is raised at once instead of buffering the file
+            if _at_window_end(text, e) and more():
+                continue
+            raise ExtractorResultError(
+                f"Error reading JSON item {count} at character {consumed + e.pos}: {e.msg}") from e
+        # the item may continue in the next chunk, numbers like 12|.5 or 1|e5
+        # parse as a prefix; other text after the item fails the ',' check below
+        if (end == len(text) or _TOKEN_TAIL.fullmatch(text, end) is not None) and more():
+            continue
+        yield item
+        count += 1
+        pos = end
+        if not skip_whitespace():
+            raise ExtractorResultError(f"Unexpected end of JSON document at character {consumed + pos}.")
+        if text[pos] == "]":
+            return
+        if text[pos] != ",":
+            raise ExtractorResultError(
+                f"Expected ',' or ']' after JSON item {count - 1} at character {consumed + pos}.")
+        pos += 1
+
+
+def _at_window_end(text: str, error: json.JSONDecodeError) -> bool:
+    """
+    Args:
+        text: decoded window of the file.
+        error: error of raw_decode on text.
+
+    Returns:
+        true if the error may come from an item cut off by the end of the
+        window: an unterminated string or a token that runs until the end
+        (for example "tru" or "-"), false for a real syntax error.
+    """
+    if error.pos >= len(text) or error.msg.startswith("Unterminated"):
+        return True
+    return _TOKEN_TAIL.fullmatch(text, error.pos) is not None
+
+
+def iter_extractor_items(file_path, use_mmap: bool = True, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Iterate lazily over the items of a (large) ExtractorResult file.
+    The file is parsed in chunks with the C decoder of the json module,
+    only the current part of the file is kept in memory. A top level
+    object is returned as one item.
+
+    Args:
+        file_path (str): Path to the JSON file.
+        use_mmap (bool): read a memory map of the file instead of the file
+            object, falls back to the file if it can not be mapped.
+        chunk_size (int): read size in bytes.
+
+    Returns:
+        iterator over the parsed items.
+
+    Raises:
+        ExtractorResultError: if the file is not found, can not be read
+        or is not valid JSON.
+    """
+    try:
+        f = open(file_path, "rb")
+    except FileNotFoundError as e:
+        raise ExtractorResultError(f"File '{file_path}' not found.") from e
+    except OSError as e:
+        raise ExtractorResultError(f"File '{file_path}' can not be read: {e}") from e
+    with f:
+        mapped = None
+        if use_mmap:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files and pipes can not be mapped
+                mapped = None
+        try:
+            # the memory map is read like the file, without a read call per chunk
+            yield from _decode_items(mapped if mapped is not None else f, chunk_size)
+        finally:
+            if mapped is not None:
+                mapped.close()
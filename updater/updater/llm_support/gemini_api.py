@@ -9,6 +9,11 @@ import json
 from updater.updater.llm_support.promtbuilder import PromptFactory #used for most deterministic extraction with llm
 from typing_extensions import override, Optional
 from updater.updater.llm_support.llm_interface import LLMInterface
+from updater.updater.llm_support.hedging import HedgingPolicy
+from updater.updater.tracing import tracer
+from updater.updater.metrics import LLM_BYTES_IN, LLM_BYTES_OUT, LLM_ERRORS, LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS
+from updater.updater.budget import estimate_tokens
+from time import monotonic, perf_counter
 import re
 logging.basicConfig(level=logging.INFO)
 
@@ -18,7 +23,8 @@ class GeminiLlmInstance(LLMInterface, ABC):
     implementation of LLMInterface for Google Gemini API
     """
 
-    def __init__(self, url: str, env_key_name: str, template_dir: Optional[str] = None,):
+    def __init__(self, url: str, env_key_name: str, template_dir: Optional[str] = None,
+                 hedging: Optional[HedgingPolicy] = None):
         super().__init__()
         self.GEMINI_API_URL = url
         self.env_key_name = env_key_name
@@ -39,6 +45,14 @@ class GeminiLlmInstance(LLMInterface, ABC):
         self.usage_log: list[str] = []
         self.logger.info("LLM API key found")
 
+        # optional hedged requests against slow responses, off by default
+        self.hedging: Optional[HedgingPolicy] = hedging
+
+        # http timeout per request, never longer than the deadline of the run
+        self.request_timeout: float = 120.0
+        # end of the run as time.monotonic() value, None for no deadline
+        self.deadline: Optional[float] = None
+
         # Prompt factory for most deterministic extraction with llm
         self.prompt_factory: PromptFactory
         if template_dir is not None:
@@ -111,25 +125,81 @@ class GeminiLlmInstance(LLMInterface, ABC):
         # response state
         valid = False
         # implmentation to fit other models if gemini is decided later as llm use genai
-        response = requests.post(
-            self.GEMINI_API_URL, headers=headers, params=params, json=data, timeout=120
-        )
+        def post():
+            # counted per http post, a hedged duplicate is a request of its own
+            LLM_REQUESTS.inc()
+            LLM_BYTES_OUT.inc(len(prompt.encode("utf-8")))
+            response = requests.post(
+                self.GEMINI_API_URL, headers=headers, params=params, json=data, timeout=self.request_seconds()
+            )
+            # tokens of every answer, the losing duplicate of a hedged request is billed too
+            self.count_tokens(prompt, response)
+            return response
+
+        start = perf_counter()
+        with tracer.span("llm.http", prompt_chars=len(prompt)) as span:
+            try:
+                # with hedging a duplicate is sent if the answer is slower than usual
+                response = (self.hedging.run(post, accept=lambda r: r.status_code == 200)
+                            if self.hedging is not None else post())
+            except requests.RequestException as e:
+                # timeouts and connection errors have no status code
+                LLM_ERRORS.inc(status=type(e).__name__)
+                raise
+            span["status"] = response.status_code
+        LLM_LATENCY.observe(perf_counter() - start)
         # 200 is statuscode from google documentation , Gemini things it's fine :)
         if response.status_code == 200:
-            response_text = response.json()["candidates"][0]["content"]["parts"][0][
+            body = response.json()
+            response_text = body["candidates"][0]["content"]["parts"][0][
                 "text"
             ]
             # response state valid
             valid = True
-
+            LLM_BYTES_IN.inc(len(response_text.encode("utf-8")))
         else:
             print(response.status_code)
+            # 429 is quota exhaustion, see README
+            LLM_ERRORS.inc(status=response.status_code)
             response_text = "no valid dataentry"
         # log usage in json
         self.usage_logging(len(response_text), valid)
 
         return response_text
 
+    def request_seconds(self) -> float:
+        """
+        http timeout of the next request
+        Return: request_timeout, shortened to the time left until deadline (at least 1 s)
+        """
+        if self.deadline is None:
+            return self.request_timeout
+        return max(1.0, min(self.request_timeout, self.deadline - monotonic()))
+
+    @staticmethod
+    def count_tokens(prompt: str, response) -> None:
+        """
+        count the tokens of one http answer in LLM_TOKENS, estimated if the api sends no usageMetadata
+        Args: prompt: sent prompt
+              response: http response, only status 200 is billed
+        """
+        if response.status_code != 200:
+            return
+        try:
+            body = response.json()
+            response_text = body["candidates"][0]["content"]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            response_text = ""
+            body = {}
+        usage = body.get("usageMetadata") if isinstance(body, dict) else None
+        usage = usage if isinstance(usage, dict) else {}
+        prompt_tokens = usage.get("promptTokenCount")
+        output_tokens = usage.get("candidatesTokenCount")
+        LLM_TOKENS.inc(prompt_tokens if isinstance(prompt_tokens, int) else estimate_tokens(prompt),
+                       kind="input")
+        LLM_TOKENS.inc(output_tokens if isinstance(output_tokens, int) else estimate_tokens(response_text),
+                       kind="output")
+
     def __del__(self):
         """
         remove api key from memory
@@ -155,11 +225,27 @@ class GeminiLlmInstance(LLMInterface, ABC):
         Returns:
             Gemini Answer
         """
+        # prompts gemini with a rendered jinja file
+        return self.query(self.render_prompt(task, **prompt_args))
+
+    def render_prompt(self, task: str, **prompt_args) -> str:
+        """
+        Render the prompt of a task via prompt-factory without sending it,
+        used by query_build and the cost estimate of --dry-run
+
+        Args:
+            task: task name for example "json_extraction"
+            **prompt_kwargs: keys for the builders
+
+        Returns:
+            prompt text as sent to Gemini
+        """
         if self.prompt_factory is None:
             raise RuntimeError("PromptFactory nicht initialisiert")
         prompt_obj = self.prompt_factory.create_prompt(task, **prompt_args)
-        # prompts gemini with a rendered jinja file
-        return self.query("ausschließlich auf deutsch antworten"+ prompt_obj.render() )
+        with tracer.span("prompt.render", task=task):
+            rendered = prompt_obj.render()
+        return "ausschließlich auf deutsch antworten" + rendered
 
     def query_parsed(self, task: str, **prompt_args) -> dict:
         """
@@ -170,14 +256,15 @@ class GeminiLlmInstance(LLMInterface, ABC):
         """
         raw = self.query_build(task, **prompt_args)
 
-        # clean content from fences
-        clean = re.sub(r"^```(?:json)?\s*\n", "", raw)
-        clean = re.sub(r"\n```$", "", clean).strip()
+        with tracer.span("llm.parse", chars=len(raw)):
+            # clean content from fences
+            clean = re.sub(r"^```(?:json)?\s*\n", "", raw)
+            clean = re.sub(r"\n```$", "", clean).strip()
 
-        try:
-            return json.loads(clean)
-        except json.JSONDecodeError:
-            return {}
+            try:
+                return json.loads(clean)
+            except json.JSONDecodeError:
+                return {}
 
 def query_validation(self, content: str, regex_result: Dict) -> str:
     """
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from time import perf_counter
+from typing import Callable, Deque, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def _spawn(call: Callable[[], T]) -> "Future[T]":
+    """
+    run call in a daemon thread, a dropped request does not delay the interpreter exit
+    Args: call: function without arguments
+    Return: future with the result of call
+    """
+    future: Future = Future()
+
+    def target() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(call())
+        except BaseException as e:  # handed to the caller
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="llm-hedge", daemon=True).start()
+    return future
+
+
+class HedgingPolicy:
+    """
+    hedged requests for the LLM client to cut the tail latency of slow batches
+
+    if a request has not answered after the chosen latency percentile of the
+    recent history, a duplicate is sent and the first answer wins.
+    the hedge rate is capped so the extra cost stays bounded.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_hedge_rate: float = 0.1,
+        history_size: int = 200,
+        min_samples: int = 10,
+    ) -> None:
+        """
+        Args: percentile: latency percentile of the history after which a duplicate is sent
+              max_hedge_rate: maximum share of requests that may be hedged (0.0 - 1.0)
+              history_size: number of recent latencies used for the percentile
+              min_samples: no hedging before this many latencies are known
+        """
+        if not 0.0 < percentile < 100.0:
+            raise ValueError(f"percentile must be between 0 and 100, got {percentile}")
+        if not 0.0 <= max_hedge_rate <= 1.0:
+            raise ValueError(f"max_hedge_rate must be between 0 and 1, got {max_hedge_rate}")
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = max(1, min_samples)
+        self._latencies: Deque[float] = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float) -> None:
+        """
+        add the latency of a finished request to the history
+        Args: seconds: latency in seconds
+        Return: None
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        latency percentile of the recent history
+        Args: None
+        Return: delay in seconds after which a duplicate is sent, None if the history is too short
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        # nearest rank percentile
+        rank = max(0, min(len(ordered) - 1, int(round(self.percentile / 100.0 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def _take_hedge(self) -> bool:
+        """
+        check the hedge rate cap and count the new hedge in one step,
+        the hedge must not exceed max_hedge_rate
+        Args: None
+        Return: true if a duplicate may be sent
+        """
+        with self._lock:
+            if (self.hedged + 1) > self.max_hedge_rate * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def run(self, call: Callable[[], T], accept: Callable[[T], bool] = lambda result: True) -> T:
+        """
+        execute call, send a duplicate if it is slower than the hedge delay
+        and return whichever usable answer arrives first
+        Args: call: function without arguments, for example the http request
+              accept: false for an answer that should not win, for example a non 200 response
+        Return: result of the first accepted call, the primary result if none is accepted
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay()
+        if delay is None or self.max_hedge_rate <= 0.0:
+            start = perf_counter()
+            result = call()
+            self.record(perf_counter() - start)
+            return result
+
+        # daemon threads: the losing request cannot be aborted, its answer is dropped
+        start = perf_counter()
+        primary = _spawn(call)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge():
+            result = primary.result()
+            self.record(perf_counter() - start)
+            return result
+
+        hedge = _spawn(call)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # on a tie the primary wins
+            for future in sorted(done, key=lambda f: f is not primary):
+                if future.exception() is not None or not accept(future.result()):
+                    # failed answer, wait for the other one
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                # lower bound for the primary latency if the hedge won
+                self.record(perf_counter() - start)
+                return future.result()
+        # both failed, report the primary answer
+        return primary.result()
+
+    def stats(self) -> dict:
+        """
+        summary of the hedging for the logs
+        Args: None
+        Return: dict with requests, hedged and hedge wins
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": (self.hedged / self.requests) if self.requests else 0.0,
+            }
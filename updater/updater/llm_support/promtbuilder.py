@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 from typing import Any, Dict, Mapping, MutableMapping, Type
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 from shared.models.llm_promt import Prompt
+from updater.updater.tracing import tracer
 
 class PromptBuilder(ABC):
     """
@@ -118,6 +119,34 @@ class JsonExtractionPromptBuilder(PromptBuilder):
         return ("schema", "payload")
 
 
+class JsonExtractionLeanPromptBuilder(JsonExtractionPromptBuilder):
+    """
+    Builder for the lean JSON extraction, only scores and genus without reasons.
+    """
+
+    def template_name(self) -> str:
+        """
+        Return the template
+        Args: None
+        Return: explicit template name task.j2
+        """
+        return "json_extraction_lean.j2"
+
+
+class ReasonPromptBuilder(JsonExtractionPromptBuilder):
+    """
+    Builder for the lazy reasons of already scored records.
+    """
+
+    def template_name(self) -> str:
+        """
+        Return the template
+        Args: None
+        Return: explicit template name task.j2
+        """
+        return "reason_extraction.j2"
+
+
 class PromptFactory:
     """
     Create the appropriate builder/prompt for a given task name.
@@ -125,6 +154,8 @@ class PromptFactory:
     # task's for which the llm has a prebuild prompt
     _TASK_REGISTRY: Dict[str, Type[PromptBuilder]] = {
         "json_extraction": JsonExtractionPromptBuilder,
+        "json_extraction_lean": JsonExtractionLeanPromptBuilder,
+        "reason_extraction": ReasonPromptBuilder,
     }
 
     def __init__(self, template_dir: str) -> None:
@@ -167,18 +198,19 @@ class PromptFactory:
         Returns:
             Prompt instance with the built template
         """
-        builder = self.new_builder(task)
-        # match the context to the builders
-        for method_name, value in context.items():
-            # try to call the builder's method with the same name as the context key'
-            method = getattr(builder, f"add_{method_name}", None)
-            if method is None:
-               print(f"no method {method_name}")
-            # for example example method take multiple values
-            if method_name == "example":
-                method(**value)
-            else:
-                method(value)
-        return builder.build()
+        with tracer.span("prompt.create", task=task):
+            builder = self.new_builder(task)
+            # match the context to the builders
+            for method_name, value in context.items():
+                # try to call the builder's method with the same name as the context key'
+                method = getattr(builder, f"add_{method_name}", None)
+                if method is None:
+                   print(f"no method {method_name}")
+                # for example example method take multiple values
+                if method_name == "example":
+                    method(**value)
+                else:
+                    method(value)
+            return builder.build()
 
 
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import heapq
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence
+
+from updater.updater.files import atomic_write
+
+
+def to_score(value: Any) -> float:
+    """
+    Args: value: score field of a result
+    Return: score as float, missing or invalid scores count as 0
+    """
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def score_of(record: Dict[str, Any]) -> float:
+    """
+    score of a result record, missing or invalid scores count as 0
+    Args: record: result record
+    Return: score as float
+    """
+    return to_score(record.get("score"))
+
+
+def merge_sorted_runs(runs: Iterable[Iterable[Any]],
+                      score: Callable[[Any], float] = score_of) -> Iterator[Any]:
+    """
+    k-way merge of runs that are each sorted by score (descending)
+    equal scores keep the order of the runs, the merge is stable
+    Args: runs: score sorted record lists or iterators
+          score: score of one item, for row ids for example RecordStore.score
+    Return: iterator over all records, sorted by score
+    """
+    return heapq.merge(*runs, key=lambda r: -score(r))
+
+
+def top_k(records: Iterable[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """
+    the k records with the highest score from an unsorted stream,
+    heap of size k, O(n log k); equal scores keep the stream order
+    Args: records: records in any order, may be a generator
+          k: number of records
+    Return: up to k records sorted by score (descending)
+    """
+    if k <= 0:
+        return []
+    return heapq.nlargest(k, records, key=score_of)
+
+
+def unique_by_key(records: Iterable[Dict[str, Any]],
+                  key: Callable[[Dict[str, Any]], Hashable]) -> Iterator[Dict[str, Any]]:
+    """
+    drop duplicate keys, the first record wins
+    after merge_sorted_runs the first one is the one with the highest score,
+    on equal scores the one of the earlier run
+    Args: records: records in merge order
+          key: record key function
+    Return: iterator without duplicates
+    """
+    seen = set()
+    for record in records:
+        k = key(record)
+        if k in seen:
+            continue
+        seen.add(k)
+        yield record
+
+
+def match_results(batch: Sequence[Dict[str, Any]], results: Any,
+                  key: Callable[[Dict[str, Any]], Hashable]) -> List[Optional[Dict[str, Any]]]:
+    """
+    assign the LLM answers to the records of a batch. the LLM may change the
+    names, so the batch-local "id" is used first, then the position (answer
+    without ids and of the same length) and only without both the record key
+    Args: batch: records sent to the LLM
+          results: parsed LLM answer
+          key: record key function
+    Return: answer per record of the batch (the same dicts), None if there is none
+    """
+    answers = [r for r in results if isinstance(r, dict)] if isinstance(results, list) else []
+    if any("id" in r for r in answers):
+        matched: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        for r in answers:
+            i = r.get("id")
+            if isinstance(i, int) and not isinstance(i, bool) and 0 <= i < len(batch) and matched[i] is None:
+                matched[i] = r
+        return matched
+    if len(answers) == len(batch):
+        return list(answers)
+    by_key: Dict[Hashable, Dict[str, Any]] = {}
+    for r in answers:
+        by_key.setdefault(key(r), r)
+    return [by_key.get(key(r)) for r in batch]
+
+
+def write_json_stream(path: Path, records: Iterable[Any]) -> int:
+    """
+    write a json list item by item, same layout as json.dump(indent=2),
+    with files.atomic_write
+    Args: path: output file
+          records: json serialisable items, may be a generator
+    Return: number of written items
+    """
+    count = 0
+    with atomic_write(path) as f:
+        f.write("[")
+        for record in records:
+            item = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(("," if count else "") + "\n  " + item)
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+
+def load_run(path: Path) -> List[Dict[str, Any]]:
+    """
+    read one output file as score sorted run
+    Args: path: output file of a shard
+    Return: records sorted by score, stable for equal scores
+    Raise: ValueError if the file does not contain a json list
+    """
+    with path.open(encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: JSON-Liste erwartet")
+    records = [r for r in data if isinstance(r, dict)]
+    # shard outputs are sorted already, this only guards against old files
+    records.sort(key=lambda r: -score_of(r))
+    return records
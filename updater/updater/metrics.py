@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from updater.updater.files import atomic_write
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# latency buckets in seconds, Gemini answers take between a second and the 120 s timeout
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 20, 30, 60, 90, 120)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    """
+    hashable and sorted representation of the labels
+    Args: labels: label name -> value
+    Return: tuple of (name, value) pairs
+    """
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """
+    format labels in the prometheus text format
+    Args: key: label key
+          extra: additional label, for example le of a histogram bucket
+    Return: '{a="b"}' or empty string
+    """
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    """
+    base class of all metrics, holds name, help text and the lock
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        """
+        prometheus sample lines of this metric
+        Return: raise error if not implemented in child class
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """
+        HELP, TYPE and sample lines in the prometheus text format
+        Args: None
+        Return: text block of the metric
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    monotonically increasing value per label set
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        """
+        Args: amount: value to add
+              **labels: labels of the sample, for example status=429
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        """
+        Args: **labels: labels of the sample
+        Return: current value, 0 if never increased
+        """
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def total(self) -> float:
+        """
+        Return: sum over all label sets
+        """
+        with self._lock:
+            return sum(self._values.values())
+
+    def by_label(self) -> Dict[LabelKey, float]:
+        """
+        Return: copy of all label sets and values
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items:
+            return [f"{self.name} 0"]
+        return [f"{self.name}{_format_labels(k)} {v:g}" for k, v in items]
+
+
+class Gauge(Counter):
+    """
+    value that can go up and down, for example rows per second
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        """
+        Args: value: new value
+              **labels: labels of the sample
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    distribution of observed values in fixed buckets, without labels
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # last slot is the +Inf bucket
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Args: value: observed value, for example latency in seconds
+        """
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        estimate a quantile from the buckets (upper bound of the bucket)
+        Args: q: quantile between 0 and 1
+        Return: estimated value, None without observations
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = q * self.count
+            seen = 0
+            for i, c in enumerate(self._counts):
+                seen += c
+                if seen >= target:
+                    return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, c in zip(self.buckets, counts):
+            cumulative += c
+            lines.append(f"{self.name}_bucket{_format_labels((), ('le', f'{bound:g}'))} {cumulative}")
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total:g}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    collection of all updater metrics, exportable as prometheus text
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help_text: str, **kwargs) -> _Metric:
+        """
+        Args: cls: metric class
+              name: unique metric name
+              help_text: HELP line
+        Return: existing metric of that name or a new one
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric '{name}' already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)  # type: ignore[return-value]
+
+    def to_prometheus(self) -> str:
+        """
+        Args: None
+        Return: all metrics in the prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        write the metrics for the node exporter textfile collector
+        with files.atomic_write
+        Args: path: output file, should end with .prom
+        """
+        with atomic_write(path) as f:
+            f.write(self.to_prometheus())
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        serve /metrics on a local endpoint in a daemon thread
+        Args: port: tcp port, 0 selects a free port
+              host: bind address, local only by default
+        Return: running server, call shutdown() to stop it
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa: N802
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # noqa: A002
+                # keep stderr for the updater output
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        return server
+
+
+# one registry for the whole updater
+registry = MetricsRegistry()
+
+LLM_REQUESTS = registry.counter("updater_llm_requests_total", "LLM requests sent")
+LLM_ERRORS = registry.counter("updater_llm_errors_total", "LLM requests without valid answer by HTTP status")
+LLM_LATENCY = registry.histogram("updater_llm_request_seconds", "LLM request latency in seconds")
+LLM_BYTES_OUT = registry.counter("updater_llm_request_bytes_total", "prompt bytes sent to the LLM")
+LLM_BYTES_IN = registry.counter("updater_llm_response_bytes_total", "response bytes received from the LLM")
+LLM_TOKENS = registry.counter("updater_llm_tokens_total", "LLM tokens by kind (input, output)")
+ROWS_INPUT = registry.counter("updater_rows_input_total", "input rows read")
+ROWS_DONE = registry.counter("updater_rows_processed_total", "result records written")
+ROWS_PER_SECOND = registry.gauge("updater_rows_per_second", "result records per second of the last run")
+RETRY_ROUNDS = registry.counter("updater_retry_rounds_total", "retry rounds for missing rows")
+RETRY_ROWS = registry.counter("updater_retry_rows_total", "rows sent again in retry rounds")
+# only the watch mode (warm start) and the service (in-flight requests) have a cache
+CACHE_HITS = registry.counter("updater_cache_hits_total",
+                              "rows answered without a new LLM request (watch and serve only)")
+CACHE_MISSES = registry.counter("updater_cache_misses_total",
+                                "rows that needed a LLM request (watch and serve only)")
+
+
+def summary() -> str:
+    """
+    short human readable summary for the end of a run
+    Args: None
+    Return: multi line summary
+    """
+    requests = LLM_REQUESTS.total()
+    errors = LLM_ERRORS.by_label()
+    error_text = ", ".join(f"{dict(k).get('status', '?')}: {v:g}" for k, v in sorted(errors.items())) or "keine"
+    hits, misses = CACHE_HITS.total(), CACHE_MISSES.total()
+    # no lookups outside watch and serve
+    hit_rate = f"{hits / (hits + misses):.1%}" if hits + misses else "-"
+    p50, p99 = LLM_LATENCY.quantile(0.5), LLM_LATENCY.quantile(0.99)
+    latency = f"p50 <= {p50:g} s, p99 <= {p99:g} s" if p50 is not None else "-"
+    return "\n".join([
+        f"LLM-Anfragen: {requests:g} (Fehler: {error_text})",
+        f"Latenz: {latency}",
+        f"Bytes gesendet/empfangen: {LLM_BYTES_OUT.total():g} / {LLM_BYTES_IN.total():g}",
+        f"Tokens Eingabe/Ausgabe: {LLM_TOKENS.value(kind='input'):g} / {LLM_TOKENS.value(kind='output'):g}",
+        f"Zeilen: {ROWS_INPUT.total():g} eingelesen, {ROWS_DONE.total():g} Ergebnisse, "
+        f"{ROWS_PER_SECOND.value():.2f} Zeilen/s",
+        f"Retry-Runden: {RETRY_ROUNDS.total():g} ({RETRY_ROWS.total():g} Zeilen)",
+        f"Cache-Trefferquote: {hit_rate}",
+    ])
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from updater.updater.tracing import tracer
+
+# cells closer than this (pt) belong to the same column / row
+COLUMN_TOLERANCE = 10.0
+ROW_TOLERANCE = 3.0
+# rough glyph width and the gap (both in em) after which two fragments
+# of a cell are separate words
+GLYPH_WIDTH = 0.5
+WORD_GAP = 1.0
+# a line closer than this (in em) below a row continues a wrapped cell of it
+WRAPPED_LINE = 1.5
+
+CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+# column titles of the table, repeated on every page
+HEADER_PREFIX = ("tiername", "tiernamen")
+
+
+class Cell(NamedTuple):
+    """
+    text fragment of the pdf table
+    page: page index
+    x: x origin of the table cell
+    y: baseline of the row
+    dx: offset of the fragment inside the cell
+    text: extracted text
+    order: position in the content stream, fragments at the same dx keep it
+    size: font size in pt
+    """
+    page: int
+    x: float
+    y: float
+    dx: float
+    text: str
+    order: int = 0
+    size: float = 10.0
+
+
+def _extract_page_cells(args: Tuple[str, int]) -> List[Cell]:
+    """
+    extract the positioned text fragments of one page, runs in a worker process
+    Args: args: (path of the pdf, page index)
+    Return: fragments of the page
+    """
+    # PyPDF2 is only needed for the pdf ingestion
+    from PyPDF2 import PdfReader
+
+    path, index = args
+    page = PdfReader(path).pages[index]
+    cells: List[Cell] = []
+
+    # matrices at the first text operator of the fragment, the matrices
+    # given to visitor_text may already belong to the next operator
+    shown: List[Optional[Tuple[List[float], List[float]]]] = [None]
+
+    def before(operator, operands, cm, tm):
+        if operator in (b"Tj", b"TJ", b"'", b'"') and shown[0] is None:
+            shown[0] = (list(cm), list(tm))
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if shown[0] is not None:
+            cm, tm = shown[0]
+            shown[0] = None
+        # whitespace fragments are kept, they are the spaces between words
+        if not text:
+            return
+        # the cell origin is set with cm, fragments inside the cell are moved with Tm,
+        # the text origin is tm x cm
+        x = cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        dx = tm[4] * cm[0] + tm[5] * cm[2]
+        size = abs(tm[0] * cm[0] + tm[1] * cm[2]) * (font_size or 1.0)
+        cells.append(Cell(index, round(x, 2), round(y, 2), round(dx, 2), text, len(cells), round(size, 2)))
+
+    page.extract_text(visitor_text=visitor, visitor_operand_before=before)
+    return cells
+
+
+def page_count(path: Path) -> int:
+    """
+    Args: path: pdf file
+    Return: number of pages
+    """
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(str(path)).pages)
+
+
+def column_origins(cells: Iterable[Cell], columns: int = 3) -> List[float]:
+    """
+    find the x origins of the table columns
+    Args: cells: fragments of all pages
+          columns: number of table columns (latin, german, russian)
+    Return: sorted x origins of the most used columns
+    """
+    clusters: List[List[float]] = []
+    for x in sorted(c.x for c in cells if c.text.strip()):
+        if clusters and x - clusters[-1][-1] <= COLUMN_TOLERANCE:
+            clusters[-1].append(x)
+        else:
+            clusters.append([x])
+    largest = sorted(clusters, key=len, reverse=True)[:columns]
+    return sorted(sum(c) / len(c) for c in largest)
+
+
+def _column_of(cell: Cell, origins: Sequence[float]) -> Optional[int]:
+    """
+    Args: cell: text fragment
+          origins: column origins (latin, german, russian)
+    Return: column index, None for text outside the table (page title)
+    """
+    # cyrillic text is always the russian name
+    if CYRILLIC.search(cell.text) and len(origins) == 3:
+        return 2
+    best = min(range(len(origins)), key=lambda i: abs(origins[i] - cell.x))
+    if abs(origins[best] - cell.x) > COLUMN_TOLERANCE:
+        return None
+    return best
+
+
+def _clean(text: str) -> str:
+    # NFKC resolves ligatures like "ﬀ" and "ﬁ" of the pdf fonts,
+    # a stress mark is a fragment of its own and gets no space before it
+    text = re.sub(r"\s+(?=[\u0300-\u036f])", "", unicodedata.normalize("NFKC", text))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _join(fragments: Sequence[Cell]) -> str:
+    """
+    join the fragments of one cell in reading order
+    Args: fragments: text fragments of one cell
+    Return: cell text, a space is added where two fragments are clearly apart
+    """
+    ordered = sorted(fragments, key=lambda c: (c.dx, c.order))
+    text = ""
+    end = None
+    for fragment in ordered:
+        if end is not None and fragment.dx - end > WORD_GAP * fragment.size and not text.endswith(" "):
+            text += " "
+        text += fragment.text
+        end = fragment.dx + len(fragment.text) * GLYPH_WIDTH * fragment.size
+    return _clean(text)
+
+
+def cells_to_rows(cells: Sequence[Cell], origins: Optional[Sequence[float]] = None) -> List[Dict[str, str]]:
+    """
+    build records in the extract_rows format from the pdf fragments
+    Args: cells: fragments of all pages, in any order
+          origins: column origins, detected from the cells if None
+    Return: list of records with category, latin, german, russian
+    """
+    if not cells:
+        return []
+    if origins is None:
+        origins = column_origins(cells)
+
+    # group fragments into table rows, pages top to bottom
+    ordered = sorted(cells, key=lambda c: (c.page, -c.y, c.order))
+    rows: List[List[Cell]] = []
+    for cell in ordered:
+        last = rows[-1] if rows else None
+        if last and last[0].page == cell.page and abs(last[0].y - cell.y) <= ROW_TOLERANCE:
+            last.append(cell)
+        else:
+            rows.append([cell])
+
+    data: List[Dict[str, str]] = []
+    category: str | None = None
+    previous: Optional[Cell] = None    # first cell of the last record
+    for row in rows:
+        parts: Dict[int, List[Cell]] = {}
+        for cell in row:
+            col = _column_of(cell, origins)
+            if col is not None:
+                parts.setdefault(col, []).append(cell)
+        texts = ["", "", ""]
+        for col, fragments in parts.items():
+            texts[col] = _join(fragments)
+        latin, german, russian = texts
+        if not (latin or german or russian):
+            continue
+        if any(t.lower().startswith(HEADER_PREFIX) for t in texts if t):
+            continue
+
+        # second line of a wrapped cell, e.g. a long latin or russian name
+        if (previous is not None and previous.page == row[0].page
+                and 0 < previous.y - row[0].y <= WRAPPED_LINE * previous.size):
+            record = data[-1]
+            for field, text in zip(("latin", "german", "russian"), texts):
+                if text:
+                    record[field] = f"{record[field]} {text}".strip()
+            continue
+
+        # category labels stand alone in the german column, sometimes with ':'
+        filled = [t for t in texts if t]
+        if len(filled) == 1 and (german or filled[0].endswith(":")):
+            category = filled[0].rstrip(":").strip()
+            previous = None
+            continue
+
+        previous = row[0]
+        data.append({
+            "category": category or "",
+            "latin": latin,
+            "german": german,
+            "russian": russian
+        })
+    return data
+
+
+@tracer.traced("extract_pdf_rows")
+def extract_pdf_rows(input_pdf: Path, workers: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    read the animal table directly from the pdf database
+    the pages are parsed in parallel in a process pool, category labels
+    are carried over page breaks afterwards
+    Args: input_pdf: pdf file, for example "Neue Datenbank.pdf"
+          workers: number of processes, default is the number of cpus
+    Return: records in the extract_rows format
+    """
+    if not input_pdf.exists():
+        raise FileNotFoundError(input_pdf)
+    pages = page_count(input_pdf)
+    tasks = [(str(input_pdf), i) for i in range(pages)]
+    workers = max(1, min(workers or os.cpu_count() or 1, pages))
+    if workers == 1:
+        per_page = [_extract_page_cells(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            per_page = list(pool.map(_extract_page_cells, tasks))
+    cells = [c for page in per_page for c in page]
+    return cells_to_rows(cells)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from updater.updater.merge import match_results, to_score
+
+Key = Tuple[str, str, str]
+
+# field order of the output file (gemini_output.json)
+ROW_FIELDS = ("category", "latin", "german", "russian")
+RESULT_FIELDS = ("gender_russian", "gender_german", "score", "reason", "gender_reason")
+# batch-local id of the prompt, only used to match the answer
+PROMPT_FIELDS = ("id",)
+
+
+def _text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def record_key(r: Dict[str, Any]) -> Key:
+    """
+    key for duplicate and completeness checks, shared by all modules
+    Args: r: row or result record
+    Return: (latin, russian, german)
+    """
+    return (
+        (r.get("latin") or "").strip(),
+        (r.get("russian") or "").strip(),
+        (r.get("german") or "").strip()
+    )
+
+
+class Row:
+    """
+    one input row, the category is interned because a few labels
+    are shared by all rows
+    """
+    __slots__ = ("id", "category", "latin", "german", "russian")
+
+    def __init__(self, row_id: int, category: str, latin: str, german: str, russian: str) -> None:
+        self.id = row_id
+        self.category = sys.intern(category)
+        self.latin = latin
+        self.german = german
+        self.russian = russian
+
+    @property
+    def key(self) -> Key:
+        """same key as record_key: (latin, russian, german)"""
+        return self.latin, self.russian, self.german
+
+    def as_dict(self) -> Dict[str, str]:
+        """
+        Return: record in the extract_rows format, built on demand for one batch
+        """
+        return {"category": self.category, "latin": self.latin,
+                "german": self.german, "russian": self.russian}
+
+
+class Result:
+    """
+    answer of the LLM for one row, the names are taken from the row
+    and not stored a second time
+    """
+    __slots__ = ("row", "category", "gender_russian", "gender_german", "score",
+                 "reason", "gender_reason", "extra", "present")
+
+    def __init__(self, row: Row, record: Dict[str, Any]) -> None:
+        """
+        Args: row: matching input row
+              record: parsed LLM answer for the row
+        """
+        self.row = row
+        category = record.get("category")
+        # the LLM may fill in a missing category
+        self.category = sys.intern(category) if isinstance(category, str) and category != row.category else None
+        # fields the answer contains, lean answers have no reasons
+        present = []
+        for field in RESULT_FIELDS:
+            if field in record:
+                present.append(field)
+            value = record.get(field)
+            setattr(self, field, sys.intern(value) if field.startswith("gender_") and isinstance(value, str)
+                    else value)
+        self.present = tuple(present)
+        extra = {k: v for k, v in record.items()
+                 if k not in ROW_FIELDS and k not in RESULT_FIELDS and k not in PROMPT_FIELDS}
+        self.extra = extra or None
+
+    @property
+    def sort_score(self) -> float:
+        return to_score(self.score)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return: result record in the output format
+        """
+        row = self.row
+        record: Dict[str, Any] = {
+            "category": self.category if self.category is not None else row.category,
+            "latin": row.latin,
+            "german": row.german,
+            "russian": row.russian,
+        }
+        for field in self.present:
+            record[field] = getattr(self, field)
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+
+class RecordStore:
+    """
+    compact store of the input rows and the results of a run
+
+    rows get integer ids in input order, results are kept per row id.
+    batches and output records are built as dicts only when needed.
+    """
+
+    def __init__(self) -> None:
+        self.rows: List[Row] = []
+        self.results: Dict[int, Result] = {}
+        self._ids: Dict[Key, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, record: Dict[str, Any]) -> int:
+        """
+        add one row, rows with a known key are not added twice
+        Args: record: row with category, latin, german, russian
+        Return: row id
+        """
+        latin, german, russian = _text(record.get("latin")), _text(record.get("german")), _text(record.get("russian"))
+        key = (latin, russian, german)
+        row_id = self._ids.get(key)
+        if row_id is None:
+            row_id = len(self.rows)
+            self.rows.append(Row(row_id, _text(record.get("category")), latin, german, russian))
+            self._ids[key] = row_id
+        return row_id
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Args: records: rows, may be a generator
+        Return: number of read rows, duplicates included
+        """
+        count = 0
+        for record in records:
+            self.add(record)
+            count += 1
+        return count
+
+    def id_of(self, record: Dict[str, Any]) -> Optional[int]:
+        """
+        Args: record: row or result record
+        Return: row id with the same record_key, None if unknown
+        """
+        return self._ids.get((_text(record.get("latin")), _text(record.get("russian")), _text(record.get("german"))))
+
+    def batch(self, ids: Iterable[int]) -> List[Dict[str, str]]:
+        """
+        Args: ids: row ids of one batch
+        Return: records for the LLM
+        """
+        return [self.rows[i].as_dict() for i in ids]
+
+    def set_result(self, record: Dict[str, Any]) -> Optional[int]:
+        """
+        store a result record by its names, for example of an earlier
+        output file (--resume), the first result wins. records that match
+        no row get a new row so they are written like before
+        Args: record: result record
+        Return: row id of a new result, None if the row already had one
+        """
+        row_id = self.id_of(record)
+        if row_id is None:
+            row_id = self.add(record)
+        if row_id in self.results:
+            return None
+        self.results[row_id] = Result(self.rows[row_id], record)
+        return row_id
+
+    def add_run(self, ids: Sequence[int], records: Any) -> List[int]:
+        """
+        store the answer of one batch as a score sorted run. answers are
+        assigned by the batch-local id, see merge.match_results, so an answer
+        with changed names still fills its row; the names are kept from the row
+        Args: ids: row ids of the batch, in prompt order
+              records: parsed LLM answer, non dict items are dropped
+        Return: row ids of the new results, sorted by score (descending, stable)
+        """
+        run = []
+        for row_id, record in zip(ids, match_results(self.batch(ids), records, record_key)):
+            # the first answer for a row wins
+            if record is None or row_id in self.results:
+                continue
+            self.results[row_id] = Result(self.rows[row_id], record)
+            run.append(row_id)
+        run.sort(key=lambda i: -self.score(i))
+        return run
+
+    def score(self, row_id: int) -> float:
+        """
+        Args: row_id: row with result
+        Return: score for sorting, see merge.score_of
+        """
+        return self.results[row_id].sort_score
+
+    def result_dicts(self, ids: Iterable[int]) -> Iterator[Dict[str, Any]]:
+        """
+        Args: ids: row ids with result, in output order
+        Return: result records in the output format, one at a time
+        """
+        for i in ids:
+            yield self.results[i].as_dict()
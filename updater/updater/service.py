@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from updater.updater import metrics
+from updater.updater.merge import match_results
+
+BatchFn = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+KeyFn = Callable[[Dict[str, Any]], Hashable]
+
+RECORD_FIELDS = ("category", "latin", "german", "russian")
+
+
+class MicroBatcher:
+    """
+    collects single records for a short window and sends them as one batch
+
+    identical keys that are already in flight share one request,
+    so many callers share one LLM call
+    """
+
+    def __init__(self, batch_fn: BatchFn, key_fn: KeyFn, window: float = 0.05,
+                 max_batch: int = 20, workers: int = 4) -> None:
+        """
+        Args: batch_fn: sends a list of records to the LLM, for example call_model_batch
+              key_fn: record key, for example record_key
+              window: seconds a new batch waits for more records
+              max_batch: a full batch is sent at once
+              workers: number of batches in flight at the same time
+        """
+        self.batch_fn = batch_fn
+        self.key_fn = key_fn
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._inflight: Dict[Hashable, Future] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich")
+
+    def submit(self, record: Dict[str, Any]) -> Future:
+        """
+        queue one record
+        Args: record: input row with category, latin, german, russian
+        Return: future with the result record, None if the LLM returned nothing for it
+        """
+        key = self.key_fn(record)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                # same animal already requested, share the answer
+                metrics.CACHE_HITS.inc()
+                return future
+            future = Future()
+            self._inflight[key] = future
+            self._pending.append(record)
+            metrics.CACHE_MISSES.inc()
+            if len(self._pending) >= self.max_batch:
+                batch = self._take_pending()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._pool.submit(self._run_batch, batch)
+        return future
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        """
+        remove the pending records, caller must hold the lock
+        Return: pending records
+        """
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def flush(self) -> None:
+        """
+        send the pending records now
+        Args: None
+        Return: None
+        """
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        call the LLM and resolve the futures of the batch
+        Args: batch: records of one window
+        Return: None
+        """
+        keys = [self.key_fn(r) for r in batch]
+        try:
+            matched = match_results(batch, self.batch_fn(batch), self.key_fn)
+            error = None
+        except Exception as e:  # the callers get the error, the service keeps running
+            matched, error = [None] * len(batch), e
+        with self._lock:
+            futures = [self._inflight.pop(k, None) for k in keys]
+        for result, future in zip(matched, futures):
+            if future is None or future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                # the batch-local id is internal
+                future.set_result({k: v for k, v in result.items() if k != "id"} if result is not None else None)
+
+    def enrich(self, records: List[Dict[str, Any]], timeout: float = 180.0) -> List[Optional[Dict[str, Any]]]:
+        """
+        enrich records and wait for the answers
+        Args: records: input rows
+              timeout: seconds to wait for all answers together
+        Return: result records in input order, None for records without answer
+        Raise: concurrent.futures.TimeoutError if not all answers arrived in time
+        """
+        futures = [self.submit(r) for r in records]
+        # one deadline for the whole request, not one per record
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            raise FutureTimeout()
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        """
+        send the pending records and stop the worker threads
+        """
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+
+def normalize_record(raw: Any) -> Dict[str, str]:
+    """
+    validate one input record and bring it into the extract_rows format
+    Args: raw: parsed json value
+    Return: record with category, latin, german, russian
+    Raise: ValueError if the record is not usable
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Eintrag muss ein JSON-Objekt sein")
+    record = {}
+    for field in RECORD_FIELDS:
+        value = raw.get(field, "")
+        if value is None:
+            value = ""
+        if not isinstance(value, str):
+            raise ValueError(f"Feld '{field}' muss ein String sein")
+        record[field] = value.strip()
+    if not (record["latin"] or record["german"] or record["russian"]):
+        raise ValueError("mindestens eines der Felder latin, german, russian wird benötigt")
+    return record
+
+
+def make_handler(batcher: MicroBatcher, max_records: int, timeout: float) -> type:
+    """
+    build the request handler for the enrichment service
+    Args: batcher: shared micro batcher
+          max_records: maximum number of records per request
+          timeout: seconds a request waits for the LLM
+    Return: handler class for ThreadingHTTPServer
+    """
+
+    class EnrichHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: Any) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):  # noqa: N802
+            if self.path.rstrip("/") == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path.rstrip("/") == "/metrics":
+                data = metrics.registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):  # noqa: N802
+            if self.path.rstrip("/") != "/enrich":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length).decode("utf-8"))
+                single = not isinstance(body, list)
+                raw_records = [body] if single else body
+                if len(raw_records) > max_records:
+                    self._send_json(413, {"error": f"höchstens {max_records} Einträge pro Anfrage"})
+                    return
+                records = [normalize_record(r) for r in raw_records]
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            try:
+                results = batcher.enrich(records, timeout=timeout)
+            except FutureTimeout:
+                self._send_json(504, {"error": "LLM hat nicht rechtzeitig geantwortet"})
+                return
+            except Exception as e:
+                self._send_json(502, {"error": str(e)})
+                return
+            missing = [i for i, r in enumerate(results) if r is None]
+            if missing:
+                self._send_json(502, {"error": "LLM hat für einen Teil der Einträge kein Ergebnis geliefert",
+                                      "missing": missing})
+                return
+            self._send_json(200, results[0] if single else results)
+
+        def log_message(self, format, *args):  # noqa: A002
+            print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+    return EnrichHandler
+
+
+def create_server(batcher: MicroBatcher, host: str = "127.0.0.1", port: int = 8765,
+                  max_records: int = 50, timeout: float = 180.0) -> ThreadingHTTPServer:
+    """
+    Args: batcher: shared micro batcher
+          host: bind address, local only by default
+          port: tcp port, 0 selects a free port
+          max_records: maximum number of records per request
+          timeout: seconds a request waits for the LLM
+    Return: server, call serve_forever() to start it
+    """
+    return ThreadingHTTPServer((host, port), make_handler(batcher, max_records, timeout))
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    parse the --shard option
+    Args: value: "i/N" with 0 <= i < N, for example "0/4"
+    Return: (index, count)
+    Raise: ValueError if the value is not valid
+    """
+    try:
+        index_text, count_text = value.split("/", 1)
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Shard muss die Form i/N haben, z.B. 0/4: '{value}'") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard {value}: es muss 0 <= i < N gelten")
+    return index, count
+
+
+def stable_shard(key: Tuple[str, ...], count: int) -> int:
+    """
+    shard of a record key, the same on every machine and python version
+    (hash() is salted per process and can not be used)
+    Args: key: record key, for example (latin, russian, german)
+          count: number of shards
+    Return: shard index 0 <= i < count
+    """
+    digest = hashlib.sha1("\x1f".join(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def select_shard(rows: Iterable[Dict[str, Any]], index: int, count: int,
+                 key: Callable[[Dict[str, Any]], Hashable]) -> List[Dict[str, Any]]:
+    """
+    Args: rows: all input rows
+          index: shard of this process
+          count: number of shards
+          key: record key function
+    Return: rows that belong to the shard
+    """
+    return [row for row in rows if stable_shard(key(row), count) == index]
+
+
+def shard_output_path(output: Path, index: int, count: int) -> Path:
+    """
+    Args: output: output file of an unsharded run
+          index: shard of this process
+          count: number of shards
+    Return: for example gemini_output.shard-0-of-4.json
+    """
+    return output.with_name(f"{output.stem}.shard-{index}-of-{count}{output.suffix}")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Iterator, List, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Tracer:
+    """
+    span based instrumentation of the updater stages
+
+    spans are only collected while the tracer is enabled and can be
+    exported in the Chrome trace format (chrome://tracing, Perfetto)
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = perf_counter_ns()
+
+    def enable(self) -> None:
+        """
+        start collecting spans, the trace time starts now
+        Args: None
+        Return: None
+        """
+        self._origin = perf_counter_ns()
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        measure the wall time of a block as a complete event
+        Args: name: name of the stage, for example "llm.query"
+              **args: additional values shown in the trace viewer
+        Return: dict of args, values added inside the block are exported too
+        """
+        if not self.enabled:
+            yield args
+            return
+        start = perf_counter_ns()
+        try:
+            yield args
+        finally:
+            end = perf_counter_ns()
+            event = {
+                "name": name,
+                "ph": "X",
+                # chrome trace uses microseconds
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def traced(self, name: str) -> Callable[[F], F]:
+        """
+        decorator variant of span
+        Args: name: name of the stage
+        Return: decorator
+        """
+        def decorator(func: F) -> F:
+            @wraps(func)
+            def wrapper(*a: Any, **kw: Any) -> Any:
+                with self.span(name):
+                    return func(*a, **kw)
+            return wrapper  # type: ignore[return-value]
+        return decorator
+
+    def events(self) -> List[Dict[str, Any]]:
+        """
+        copy of all collected events
+        Args: None
+        Return: list of chrome trace events
+        """
+        with self._lock:
+            return list(self._events)
+
+    def export(self, path: str) -> None:
+        """
+        write the spans as Chrome trace json
+        Args: path: output file
+        Return: None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"},
+                      f, ensure_ascii=False, default=str)
+
+
+# one tracer for the whole updater, disabled until --trace is set
+tracer = Tracer()
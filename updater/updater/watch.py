@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+def file_hash(path: Path) -> str:
+    """
+    sha256 of the file content
+    Args: path: file to hash
+    Return: hex digest
+    """
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FileWatcher:
+    """
+    polls input files for changes
+
+    the mtime is checked first, the content hash is only computed if the
+    mtime moved. a save without content change is therefore not reported.
+    """
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        self.paths: List[Path] = list(paths)
+        self._state: Dict[Path, Tuple[Optional[int], Optional[str]]] = {}
+        for path in self.paths:
+            self._state[path] = self._fingerprint(path, None)
+
+    @staticmethod
+    def _fingerprint(path: Path, old: Optional[Tuple[Optional[int], Optional[str]]]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Args: path: watched file
+              old: last known (mtime, hash), the hash is reused if the mtime is unchanged
+        Return: (mtime_ns, sha256) or (None, None) if the file does not exist
+        """
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None, None
+        if old is not None and old[0] == mtime:
+            return old
+        try:
+            return mtime, file_hash(path)
+        except FileNotFoundError:
+            return None, None
+
+    def changed(self) -> List[Path]:
+        """
+        poll all files once
+        Args: None
+        Return: files whose content changed since the last poll
+        """
+        result: List[Path] = []
+        for path in self.paths:
+            old = self._state[path]
+            new = self._fingerprint(path, old)
+            self._state[path] = new
+            if new[1] != old[1]:
+                result.append(path)
+        return result
+
+
+def diff_rows(
+    old_rows: Sequence[Dict[str, Any]],
+    new_rows: Sequence[Dict[str, Any]],
+    key: Callable[[Dict[str, Any]], Hashable],
+) -> Tuple[List[Dict[str, Any]], List[Hashable]]:
+    """
+    compare two versions of the rows of one input file
+    Args: old_rows: rows before the change
+          new_rows: rows after the change
+          key: record key function
+    Return: (new or changed rows, keys of removed rows)
+    """
+    old_by_key = {key(r): r for r in old_rows}
+    new_keys = set()
+    affected: List[Dict[str, Any]] = []
+    for row in new_rows:
+        k = key(row)
+        new_keys.add(k)
+        # a changed category also changes the result
+        if old_by_key.get(k) != row:
+            affected.append(row)
+    removed = [k for k in old_by_key if k not in new_keys]
+    return affected, removed
+